@@ -2,6 +2,7 @@
 /* eslint-disable @typescript-eslint/no-explicit-any */
 import React, { useEffect, useState } from 'react';
 import { getAdjacencyList } from '../utils/graph-data';
+import { getSimilarPapers } from '../utils/graph-utils';
 import CollapsiblePanel from './CollapsiblePanel';
 import '../assets/scroll-box.css';
 
@@ -45,6 +46,8 @@ const PaperInfoBox: React.FC = () => {
 
   if (!paper || !persistedNode) return null;
 
+  const adj = getAdjacencyList();
+  const similar = getSimilarPapers(adj, persistedNode, 5);
   const paperUrl = `https://www.ncbi.nlm.nih.gov/pmc/articles/${persistedNode}`;
   return (
     <CollapsiblePanel
@@ -74,6 +77,18 @@ const PaperInfoBox: React.FC = () => {
         <div style={{ fontSize: '0.95rem', marginBottom: 2 }}><strong>Summary:</strong> {formatSummary(paper.summary)}</div>
         <div style={{ fontSize: '0.95rem' }}><strong>References:</strong> {paper.references && paper.references.length > 0 ? paper.references.join(', ') : 'None'}</div>
         <div style={{ fontSize: '0.95rem', marginBottom: 2 }}><strong>Cited By:</strong> {paper.citations}</div>
+        {similar.length > 0 && (
+          <div style={{ fontSize: '0.95rem' }}>
+            <strong>Similar Papers:</strong>
+            {similar.map(id => (
+              <div key={id}>
+                <a onClick={() => window.setClickedNode(id)} style={{ color: '#84f1ff', cursor: 'pointer' }}>
+                  {adj[id].title}
+                </a>
+              </div>
+            ))}
+          </div>
+        )}
       </div>
     </CollapsiblePanel>
   );
@@ -7,5 +7,8 @@ export type Paper = {
   references: string[];
   citations: number;
   vector: number[];
+  vector_scale?: number; // int8 exports only: vector ~= values * vector_scale
+  similar?: string[]; // most similar papers, best first (build_data.py --neighbors)
+  similar_scores?: number[]; // cosine similarity of each entry in similar
   label?: string;
 };
@@ -148,6 +148,12 @@ export function findClosestEmbedding(
   return closestId;
 }
 
+// Precomputed at build time (build_data.py --neighbors), so this is a lookup, not a scan
+export function getSimilarPapers(papers: AdjacencyList, id: string, k?: number): string[] {
+  const similar = (papers[id]?.similar ?? []).filter(other => papers[other]);
+  return k === undefined ? similar : similar.slice(0, k);
+}
+
 function wouldCreateCycle(graph: Graph, source: string, target: string): boolean {
   if (!graph.hasNode(source) || !graph.hasNode(target)) return false;
 
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+ann_index.py (IVF approximate nearest-neighbour index over a vector store)
+
+Exact search (vector_search.py) compares a query with every paper: fine for a few
+thousand, linear in the corpus once the citation graph is crawled further. An IVF
+(inverted file) index clusters the normalized vectors once, offline, with spherical
+k-means into --lists cells. A query is compared with the cell centroids, then only
+with the papers in its nprobe closest cells:
+
+  cost per query  ~ lists + nprobe * n / lists   dot products (vs n exact)
+  nprobe          the recall / latency knob: 1 is fastest, nprobe = lists is exact
+
+Vectors are stored grouped by cell, so each probed cell is one contiguous slice of
+a memory-mapped matrix. An index is a directory holding:
+
+  centroids.npy   (lists, dim) float32, unit length
+  vectors.npy     (n, dim) float32, normalized, rows grouped by cell
+  offsets.npy     (lists + 1,) int64; cell c is rows offsets[c]:offsets[c + 1]
+  ids.txt         the id of each row of vectors.npy, one per line
+  meta.json       {"kind": "ivf", "dim", "rows", "lists", "nprobe", "source"}
+
+The index is a snapshot: rebuild it after the store grows (an id appended again
+keeps only its latest row, as in VectorStore.index()). benchmarks/bench_ann.py
+measures recall@k and queries/sec against exact search for a sweep of nprobe.
+
+Usage:
+  index = IVFIndex.load("ai_index")
+  ids, sims = index.search(query_vector, k=10, nprobe=8)
+
+  python ann_index.py build ai_vectors ai_index --lists 256
+  python ann_index.py info ai_index
+  python ann_index.py query ai_index PMC123456 --k 10 --nprobe 16
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from vector_search import normalize
+
+CENTROIDS = "centroids.npy"
+VECTORS = "vectors.npy"
+OFFSETS = "offsets.npy"
+IDS = "ids.txt"
+META = "meta.json"
+
+KMEANS_ITERATIONS = 20
+TRAIN_PER_LIST = 256       # k-means sample size per cell; more adds build time, not quality
+ASSIGN_BLOCK = 8192        # rows per assignment matrix multiply
+
+
+def default_lists(n: int) -> int:
+    """About 4 * sqrt(n) cells, the usual IVF starting point."""
+    return max(1, min(n, int(round(4 * np.sqrt(n)))))
+
+
+def default_nprobe(lists: int) -> int:
+    return max(1, lists // 16)
+
+
+# ---------- building ----------
+def assign(vectors, centroids):
+    """Nearest centroid (by cosine) of every normalized row, in blocks."""
+    cells = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        cells[start:start + ASSIGN_BLOCK] = np.argmax(vectors[start:start + ASSIGN_BLOCK] @ centroids.T, axis=1)
+    return cells
+
+
+def kmeans(vectors, lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+    """Spherical k-means on normalized rows; (lists, dim) unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = vectors[np.sort(rng.choice(n, size=min(n, lists * TRAIN_PER_LIST), replace=False))]
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        cells = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, cells, sample)
+        counts = np.bincount(cells, minlength=lists)
+        empty = counts == 0
+        # restart empty cells on random sample rows so no cell is wasted
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def build(ids, matrix, root: str, lists: int = None, nprobe: int = None, seed: int = 0, source: str = None):
+    """Cluster the (ids, matrix) corpus and write the index directory; returns its meta."""
+    latest = {record_id: row for row, record_id in enumerate(ids)}
+    rows = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+    ids = list(latest)
+    vectors = normalize(np.asarray(matrix)[rows])
+    n, dim = vectors.shape
+    if n == 0:
+        raise ValueError("cannot index an empty corpus")
+    lists = min(lists or default_lists(n), n)
+    centroids = kmeans(vectors, lists, seed=seed)
+    cells = assign(vectors, centroids)
+    order = np.argsort(cells, kind="stable")
+    offsets = np.zeros(lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=lists), out=offsets[1:])
+
+    os.makedirs(root, exist_ok=True)
+    # a directory without meta.json is an unfinished build: drop the old one before
+    # any file it describes is replaced, so a crashed rebuild never loads
+    meta_path = os.path.join(root, META)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    np.save(os.path.join(root, CENTROIDS), centroids.astype(np.float32))
+    np.save(os.path.join(root, VECTORS), vectors[order])
+    np.save(os.path.join(root, OFFSETS), offsets)
+    with open(os.path.join(root, IDS), "w", encoding="utf-8") as f:
+        f.write("".join(ids[row] + "\n" for row in order))
+    meta = {"kind": "ivf", "dim": int(dim), "rows": int(n), "lists": int(lists),
+            "nprobe": int(min(nprobe or default_nprobe(lists), lists)), "source": source}
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+    return meta
+
+
+# ---------- querying ----------
+class IVFIndex:
+    def __init__(self, ids, centroids, vectors, offsets, nprobe: int):
+        self.ids = ids
+        self.centroids = centroids
+        self.vectors = vectors
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def load(cls, root: str, mmap: bool = True):
+        """Open an index directory; vectors.npy is memory-mapped unless mmap=False."""
+        meta_path = os.path.join(root, META)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"{root} is not a built index (no {META})")
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(root, IDS), encoding="utf-8") as f:
+            ids = [line.rstrip("\n") for line in f]
+        return cls(
+            ids,
+            np.load(os.path.join(root, CENTROIDS)),
+            np.load(os.path.join(root, VECTORS), mmap_mode="r" if mmap else None),
+            np.load(os.path.join(root, OFFSETS)),
+            meta["nprobe"],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def lists(self) -> int:
+        return len(self.centroids)
+
+    def search_rows(self, queries, k: int = 10, nprobe: int = None, exclude=None):
+        """
+        (rows, sims) for each query row, best first, as row numbers into self.ids.
+        Queries need not be normalized. A query whose probed cells hold fewer than k
+        papers gets row -1 / sim -inf padding. exclude[i] is a row query i may not
+        match (its own paper in leave-one-out evaluation).
+        """
+        queries = normalize(np.atleast_2d(queries))
+        nprobe = min(nprobe or self.nprobe, self.lists)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        out_sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            spans = [(self.offsets[c], self.offsets[c + 1]) for c in probes[i]]
+            candidates = np.concatenate([np.arange(lo, hi) for lo, hi in spans])
+            if not len(candidates):
+                continue
+            # each cell is a contiguous slice of the (memory-mapped) matrix: no gather copy
+            sims = np.concatenate([self.vectors[lo:hi] @ query for lo, hi in spans])
+            if exclude is not None:
+                sims[candidates == exclude[i]] = -np.inf
+            top = min(k, len(candidates))
+            best = np.argpartition(-sims, top - 1)[:top]
+            best = best[np.argsort(-sims[best], kind="stable")]
+            out_rows[i, :top] = candidates[best]
+            out_sims[i, :top] = sims[best]
+        out_rows[~np.isfinite(out_sims)] = -1
+        return out_rows, out_sims
+
+    def search(self, query, k: int = 10, nprobe: int = None):
+        """(ids, sims) of the k papers closest to one query vector, best first."""
+        rows, sims = self.search_rows(query, k, nprobe)
+        keep = rows[0] >= 0
+        return [self.ids[row] for row in rows[0][keep]], sims[0][keep].tolist()
+
+
+# ---------- cli ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an IVF approximate nearest-neighbour index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="Cluster a vector store into an index directory")
+    build_cmd.add_argument("store", help="Vector store to index (vector_store.py)")
+    build_cmd.add_argument("index", help="Index directory to write")
+    build_cmd.add_argument("--lists", type=int, help="Number of cells (default about 4 * sqrt(rows))")
+    build_cmd.add_argument("--nprobe", type=int, help="Cells searched per query by default (default lists / 16)")
+    build_cmd.add_argument("--seed", type=int, default=0)
+    info = sub.add_parser("info", help="Rows, cells and cell sizes of an index")
+    info.add_argument("index")
+    query = sub.add_parser("query", help="Nearest papers to a paper already in the index")
+    query.add_argument("index")
+    query.add_argument("id", help="Paper id whose vector is the query")
+    query.add_argument("--k", type=int, default=10)
+    query.add_argument("--nprobe", type=int, help="Cells to search (default: the index's)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        from vector_store import VectorStore
+
+        ids, matrix = VectorStore(args.store).load()
+        start = time.perf_counter()
+        meta = build(ids, matrix, args.index, args.lists, args.nprobe, args.seed, source=args.store)
+        print(f"Indexed {meta['rows']} vectors of {meta['dim']} dims into {meta['lists']} cells "
+              f"(nprobe {meta['nprobe']}) in {time.perf_counter() - start:.1f}s -> {args.index}")
+        return
+
+    index = IVFIndex.load(args.index)
+    if args.command == "info":
+        sizes = np.diff(index.offsets)
+        print(f"{len(index)} rows, dim {index.vectors.shape[1]}, {index.lists} cells "
+              f"(size min {sizes.min()} / median {int(np.median(sizes))} / max {sizes.max()}), nprobe {index.nprobe}")
+        return
+
+    if args.id not in index.ids:
+        raise SystemExit(f"{args.id} is not in {args.index}")
+    own = index.ids.index(args.id)
+    rows, sims = index.search_rows(index.vectors[own], args.k, args.nprobe, exclude=[own])
+    for row, sim in zip(rows[0], sims[0]):
+        if row >= 0:
+            print(f"{sim:.4f}  {index.ids[row]}")
+
+
+if __name__ == "__main__":
+    main()
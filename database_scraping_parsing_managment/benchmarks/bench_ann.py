@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+bench_ann.py (recall and queries/sec of the IVF index vs exact search)
+
+Builds an ann_index.py index over the corpus, then for each nprobe in the sweep
+reports:
+  recall@k     share of the exact top-k (vector_search.top_k) the index also returns,
+               averaged over leave-one-out queries (a paper's own vector, paper excluded)
+  top-1        share of queries whose single best match is unchanged
+  qps          queries/sec answering one query at a time (how the app asks), next to
+               exact search's in the first row
+  scanned      mean share of the corpus compared per query
+
+Vectors come from a vector store (--store), or a synthetic clustered set shaped like
+a crawled corpus (default 20000 x 768; reduce_dims.py widths are typical for search).
+
+Usage:
+  python benchmarks/bench_ann.py
+  python benchmarks/bench_ann.py --n 50000 --dim 3072 --lists 1024 --nprobe 4,16,64
+  python benchmarks/bench_ann.py --store ai_vectors
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from ann_index import IVFIndex, build
+from vector_search import normalize, recall_at_k, top_k
+
+
+def synthetic(n: int, dim: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, n)] + 0.8 * rng.normal(size=(n, dim)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def load_vectors(args):
+    if args.store:
+        from vector_store import VectorStore
+
+        ids, matrix = VectorStore(args.store).load()
+        return ids, np.asarray(matrix, dtype=np.float32)
+    matrix = synthetic(args.n, args.dim, args.clusters, args.seed)
+    return [f"P{i}" for i in range(len(matrix))], matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall@k and queries/sec of the IVF index.")
+    parser.add_argument("--store", help="Vector store directory (vector_store.py)")
+    parser.add_argument("--n", type=int, default=20000, help="Synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic dimension")
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic topic clusters")
+    parser.add_argument("--lists", type=int, help="IVF cells (default: ann_index's)")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="Comma-separated nprobe values to sweep")
+    parser.add_argument("--queries", type=int, default=300, help="Papers used as leave-one-out queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids, matrix = load_vectors(args)
+    # one row per id, as the index keeps it
+    latest = {record_id: row for row, record_id in enumerate(ids)}
+    ids, matrix = list(latest), normalize(matrix[list(latest.values())])
+    n, dim = matrix.shape
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(n, size=min(args.queries, n), replace=False)
+    queries = matrix[query_rows]
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        meta = build(ids, matrix, root, args.lists, seed=args.seed)
+        build_seconds = time.perf_counter() - start
+        index = IVFIndex.load(root)
+        # index rows are grouped by cell; map them back to corpus rows
+        position = {record_id: row for row, record_id in enumerate(ids)}
+        corpus_row = np.array([position[record_id] for record_id in index.ids])
+        index_row = np.argsort(corpus_row)
+
+        exact, _ = top_k(queries, matrix, args.k, exclude=query_rows)
+        start = time.perf_counter()
+        for row in query_rows:
+            top_k(matrix[row][None], matrix, args.k, exclude=[row])
+        exact_qps = len(query_rows) / (time.perf_counter() - start)
+
+        sizes = np.diff(index.offsets)
+        print(f"{n} vectors x {dim} dims, {meta['lists']} cells (median {int(np.median(sizes))} papers), "
+              f"built in {build_seconds:.1f}s; {len(query_rows)} queries, k={args.k}\n")
+        print(f"{'nprobe':>7} {f'recall@{args.k}':>10} {'top-1':>6} {'qps':>9} {'speedup':>8} {'scanned':>8}")
+        print(f"{'exact':>7} {1.0:>10.3f} {1.0:>6.3f} {exact_qps:>9.0f} {1.0:>7.1f}x {1.0:>8.3f}")
+        for nprobe in [int(p) for p in args.nprobe.split(",") if int(p) <= meta["lists"]]:
+            start = time.perf_counter()
+            found = np.vstack([index.search_rows(matrix[row], args.k, nprobe, exclude=[index_row[row]])[0]
+                               for row in query_rows])
+            qps = len(query_rows) / (time.perf_counter() - start)
+            found = np.where(found >= 0, corpus_row[found], -1)
+            probes = np.argsort(-(queries @ index.centroids.T), axis=1)[:, :nprobe]
+            scanned = sizes[probes].sum(axis=1).mean() / n
+            print(f"{nprobe:>7} {recall_at_k(exact, found):>10.3f} {np.mean(exact[:, 0] == found[:, 0]):>6.3f} "
+                  f"{qps:>9.0f} {qps / exact_qps:>7.1f}x {scanned:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_cli_import.py (start-up cost of cli.py; regression guard for lazy imports)
+
+Runs `python -X importtime cli.py [command] --help` for the bare CLI and every command in
+a fresh interpreter, and reports wall time, total import time and the slowest modules
+imported. Fails (exit 1) if a heavy dependency is imported before the step actually
+runs, or if a start-up takes longer than --budget seconds.
+
+For scale it also times importing the heavy dependencies themselves (the old scripts
+loaded all of them at module load, even for --help).
+
+Usage:
+  python benchmarks/bench_cli_import.py
+  python benchmarks/bench_cli_import.py --budget 0.5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+CLI = os.path.join(ROOT, "cli.py")
+
+COMMANDS = ["", "scrape", "fix", "summarize", "merge", "build"]
+# must only be imported once a step starts working
+HEAVY = ["pandas", "bs4", "google.generativeai", "numpy", "tqdm"]
+
+
+def run_importtime(args):
+    """(wall seconds, {module: cumulative import us}) for one fresh interpreter."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # nested imports are indented under the module that triggered them
+            modules[name[1:].rstrip()] = int(cumulative)
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cli.py start-up time and check for eager heavy imports.")
+    parser.add_argument("--budget", type=float, default=1.0, help="Max wall seconds for any `--help` start-up")
+    parser.add_argument("--top", type=int, default=3, help="Slowest top-level imports to list per command")
+    args = parser.parse_args()
+
+    heavy_available = [m for m in HEAVY if subprocess.run([sys.executable, "-c", f"import {m}"], capture_output=True).returncode == 0]
+    wall, modules = run_importtime(["-c", "import " + ", ".join(heavy_available)])
+    print(f"importing {', '.join(heavy_available)} directly: {wall:.2f} s wall, "
+          f"{sum(modules.get(m, 0) for m in heavy_available) / 1e6:.2f} s of imports\n")
+
+    print(f"{'command':<24} {'wall s':>7} {'imports s':>10}  slowest imports")
+    failures = []
+    for command in COMMANDS:
+        argv = [CLI] + ([command] if command else []) + ["--help"]
+        wall, modules = run_importtime(argv)
+        top_level = {name: us for name, us in modules.items() if not name.startswith(" ")}
+        slowest = sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]
+        label = f"cli.py {command} --help".replace("  ", " ")
+        print(f"{label:<24} {wall:>7.2f} {sum(top_level.values()) / 1e6:>10.2f}  "
+              + ", ".join(f"{name} {us / 1e3:.0f}ms" for name, us in slowest))
+        eager = [m for m in HEAVY if m in {name.strip() for name in modules}]
+        if eager:
+            failures.append(f"{label}: imports {', '.join(eager)} at start-up")
+        if wall > args.budget:
+            failures.append(f"{label}: {wall:.2f} s is over the {args.budget:.2f} s budget")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+        raise SystemExit(1)
+    print("\nno heavy imports before a step runs")
+
+
+if __name__ == "__main__":
+    main()
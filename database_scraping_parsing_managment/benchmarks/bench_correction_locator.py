@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+bench_correction_locator.py (old find_correction_href tag scan vs the one-pass locator)
+
+  tag scan   the original find_correction_href: get_text(" ", strip=True) on every tag,
+             so each ancestor re-serializes its whole subtree
+  bs4 / lxml parsers.find_correction_href backends: one pass over the text nodes, then
+             up to the smallest element holding the phrase
+
+By default every page in fixtures/ is timed as-is. Two of them carry the full layout of
+a pmc.ncbi.nlm.nih.gov article page (banner, header, author popovers, side panels,
+footer; about 18 levels deep):
+  pmc_correction_page.html   an author correction: notice near the top, 47 KB
+  pmc_nested_article.html    a full research article, sections nested four deep with
+                             tables, figures and 110 references, and a "This corrects
+                             the article" note at the very end; 370 KB
+They were reconstructed offline from PMC's markup, with generated article text. Saved
+real pages can be dropped into fixtures/ or passed with --pages. --grow repeats each
+page's <article> 1x..16x with a notice appended, to show how the cost scales.
+
+Usage:
+  python benchmarks/bench_correction_locator.py
+  python benchmarks/bench_correction_locator.py --pages saved_pages/ --repeat 5
+  python benchmarks/bench_correction_locator.py --grow
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+
+import parsers
+
+DEFAULT_FIXTURES = os.path.join(HERE, "fixtures")
+PAGE_URL = "https://pmc.ncbi.nlm.nih.gov/articles/PMC3000000/"
+SCALES = [1, 2, 4, 8, 16]
+NOTICE = ('<section id="correction"><p>This corrects the article '
+          '<a href="/articles/PMC3000001/">"Original article"</a>.</p></section>')
+
+
+def tag_scan(html, base_url=None):
+    """The pre-locator find_correction_href, kept here as the baseline."""
+    soup = BeautifulSoup(html, "lxml")
+    phrase_re = re.compile(re.escape(parsers.TARGET_PHRASE), re.I)
+    matched = [tag for tag in soup.find_all() if tag.get_text(" ", strip=True) and phrase_re.search(tag.get_text(" ", strip=True))]
+    if not matched:
+        return None, "phrase_not_found", None
+
+    page_norm = parsers.normalize_url_no_fragment(base_url) if base_url else ""
+
+    def candidates_from_element(el):
+        cand = []
+        for a in el.find_all("a", href=True):
+            href = a.get("href", "").strip()
+            if href.startswith("#"):
+                continue
+            resolved = parsers.resolve_pmc_href(href)
+            if not resolved:
+                continue
+            if page_norm and parsers.normalize_url_no_fragment(resolved) == page_norm:
+                continue
+            cand.append((resolved, a))
+        return cand
+
+    for el in matched:
+        cands = candidates_from_element(el)
+        if cands:
+            return cands[0][0], "first_candidate_inside", el.get_text(" ", strip=True)[:400]
+    return None, "phrase_found_no_valid_anchor", matched[0].get_text(" ", strip=True)[:400]
+
+
+def grown_pages(fixtures):
+    for path in sorted(glob.glob(os.path.join(fixtures, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        m = re.search(r"<article[^>]*>.*</article>", page, re.S)
+        if not m:
+            continue
+        for scale in SCALES:
+            body = m.group(0) * scale + NOTICE
+            yield f"{os.path.basename(path)} x{scale}", page[:m.start()] + body + page[m.end():]
+
+
+def saved_pages(directory):
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            yield os.path.basename(path), f.read()
+
+
+def cpu_per_call(fn, page, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(page, PAGE_URL)
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark correction-link location on article pages.")
+    parser.add_argument("--pages", default=DEFAULT_FIXTURES, help="Directory of saved article pages (.html)")
+    parser.add_argument("--grow", action="store_true", help="Time each page grown 1x..16x instead of as-is")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per page and implementation")
+    args = parser.parse_args()
+
+    pages = list(grown_pages(args.pages) if args.grow else saved_pages(args.pages))
+    if not pages:
+        raise SystemExit("No article pages to time")
+
+    print(f"{'page':<30} {'KB':>6} {'tag scan ms':>12} {'bs4 ms':>8} {'lxml ms':>8} {'vs scan':>8}  result")
+    for name, page in pages:
+        lx = parsers._find_correction_href_lxml(page, PAGE_URL)
+        if parsers._find_correction_href_bs4(page, PAGE_URL) != lx:
+            raise SystemExit(f"{name}: bs4 and lxml locators disagree")
+        scan_cpu = cpu_per_call(tag_scan, page, args.repeat)
+        bs_cpu = cpu_per_call(parsers._find_correction_href_bs4, page, args.repeat)
+        lx_cpu = cpu_per_call(parsers._find_correction_href_lxml, page, args.repeat)
+        print(f"{name:<30} {len(page) / 1024:>6.0f} {scan_cpu * 1000:>12.1f} {bs_cpu * 1000:>8.1f} "
+              f"{lx_cpu * 1000:>8.1f} {scan_cpu / lx_cpu:>7.0f}x  {lx[1]} {lx[0] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+bench_parsers.py (BeautifulSoup reference vs lxml fast path for parsers.py)
+
+Runs every extractor in parsers.py with both backends over saved pages:
+  *.html   extract_title_from_html, find_correction_href, extract_sections
+  *.xml    extract_title_from_pmc_xml
+checks the two backends give identical output, then reports CPU time per call.
+
+Usage:
+  python benchmarks/bench_parsers.py
+  python benchmarks/bench_parsers.py --fixtures saved_pages/ --repeat 50
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import parsers
+
+DEFAULT_FIXTURES = os.path.join(HERE, "fixtures")
+PAGE_URL = "https://pmc.ncbi.nlm.nih.gov/articles/PMC3000000/"
+
+HTML_EXTRACTORS = {
+    "title": (parsers._title_from_html_lxml, parsers._title_from_html_bs4, lambda page: (page,)),
+    "correction": (parsers._find_correction_href_lxml, parsers._find_correction_href_bs4, lambda page: (page, PAGE_URL)),
+    # the summarizer hands over raw response bytes
+    "sections": (parsers._extract_sections_lxml, parsers._extract_sections_bs4, lambda page: (page.encode("utf-8"),)),
+}
+XML_EXTRACTORS = {
+    "xml title": (parsers._title_from_pmc_xml_lxml, parsers._title_from_pmc_xml_bs4, lambda page: (page,)),
+}
+
+
+def cpu_per_call(fn, args, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parsers.py backends on saved pages.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Directory of saved .html / .xml pages")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per page, extractor and backend")
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(os.path.join(args.fixtures, "*.html")) + glob.glob(os.path.join(args.fixtures, "*.xml")))
+    if not pages:
+        raise SystemExit(f"No .html or .xml files in {args.fixtures}")
+
+    print(f"{'page':<26} {'extractor':<11} {'KB':>5} {'bs4 ms':>8} {'lxml ms':>8} {'speedup':>8}")
+    totals = {"bs4": 0.0, "lxml": 0.0}
+    for path in pages:
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        extractors = XML_EXTRACTORS if path.endswith(".xml") else HTML_EXTRACTORS
+        for name, (fast, reference, make_args) in extractors.items():
+            call_args = make_args(page)
+            if fast(*call_args) != reference(*call_args):
+                raise SystemExit(f"{os.path.basename(path)}: {name} differs between the lxml and bs4 backends")
+            bs_cpu = cpu_per_call(reference, call_args, args.repeat)
+            lx_cpu = cpu_per_call(fast, call_args, args.repeat)
+            totals["bs4"] += bs_cpu
+            totals["lxml"] += lx_cpu
+            print(f"{os.path.basename(path):<26} {name:<11} {len(page) / 1024:>5.0f} {bs_cpu * 1000:>8.2f} "
+                  f"{lx_cpu * 1000:>8.2f} {bs_cpu / lx_cpu:>7.1f}x")
+
+    print(f"\nall extractors: bs4 {totals['bs4'] * 1000:.1f} ms, lxml {totals['lxml'] * 1000:.1f} ms "
+          f"({totals['bs4'] / totals['lxml']:.1f}x less CPU); outputs identical")
+
+
+if __name__ == "__main__":
+    main()
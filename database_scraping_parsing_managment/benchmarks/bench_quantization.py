@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+bench_quantization.py (size vs nearest-neighbour recall of the exported vector formats)
+
+For float32, float16 and int8 (per-vector scale; vector_store.export_vector) reports:
+  bytes/vec   in-memory size of one vector (int8 includes its float32 scale)
+  json/vec    size of the exported "vector" (+ "vector_scale") JSON per paper
+  recall@k    share of the exact top-k (cosine, float32) found by ranking the
+              full-precision queries against the quantized vectors, averaged over
+              the queries; each query is a paper's own vector with the paper left out
+              (what findClosestEmbedding does for a summary close to an existing one)
+  top-1       share of queries whose single best match is unchanged
+  max |dcos|  largest cosine error over every query/paper pair
+
+Vectors come from a vector store (--store), NDJSON records with a "vector" field
+(--records), or a synthetic clustered set shaped like the Gemini embeddings.
+
+Usage:
+  python benchmarks/bench_quantization.py
+  python benchmarks/bench_quantization.py --store ai_vectors --queries 500
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from vector_store import VECTOR_FORMATS, VectorStore, export_vector, quantize
+
+
+def synthetic(n: int, dim: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, n)] + 0.8 * rng.normal(size=(n, dim)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def load_vectors(args):
+    if args.store:
+        return np.asarray(VectorStore(args.store).matrix(), dtype=np.float32)
+    if args.records:
+        from ndjson_io import iter_records
+
+        return np.array([r["vector"] for _, r in iter_records(args.records) if r.get("vector")], dtype=np.float32)
+    return synthetic(args.n, args.dim, args.clusters, args.seed)
+
+
+def normalized(m):
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def top_k(queries, base, query_rows, k):
+    sims = queries @ base.T
+    # leave each query's own paper out
+    sims[np.arange(len(query_rows)), query_rows] = -np.inf
+    return np.argsort(-sims, axis=1)[:, :k], sims
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure size and recall of float16/int8 vector exports.")
+    parser.add_argument("--store", help="Vector store directory (vector_store.py)")
+    parser.add_argument("--records", help="NDJSON records with a 'vector' field")
+    parser.add_argument("--n", type=int, default=2000, help="Synthetic vectors")
+    parser.add_argument("--dim", type=int, default=3072, help="Synthetic dimension")
+    parser.add_argument("--clusters", type=int, default=40, help="Synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=300, help="Papers used as leave-one-out queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    n, dim = vectors.shape
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(n, size=min(args.queries, n), replace=False)
+    queries = normalized(vectors[query_rows])
+    exact, exact_sims = top_k(queries, normalized(vectors), query_rows, args.k)
+    print(f"{n} vectors x {dim} dims, {len(query_rows)} queries, k={args.k}\n")
+
+    print(f"{'format':<8} {'bytes/vec':>9} {'json/vec':>9} {'size':>6} {f'recall@{args.k}':>10} {'top-1':>6} "
+          f"{'max |dcos|':>10} {'quantize s':>10}")
+    baseline_json = None
+    for vector_format in VECTOR_FORMATS:
+        start = time.perf_counter()
+        approx = quantize(vectors, vector_format)
+        elapsed = time.perf_counter() - start
+        found, sims = top_k(queries, normalized(approx), query_rows, args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(exact, found)])
+        top1 = np.mean(exact[:, 0] == found[:, 0])
+        finite = np.isfinite(exact_sims)
+        max_err = np.abs(sims[finite] - exact_sims[finite]).max()
+
+        sample = vectors[: min(n, 200)]
+        json_bytes = np.mean([len(json.dumps(export_vector(v, vector_format), separators=(",", ":"))) for v in sample])
+        baseline_json = baseline_json or json_bytes
+        mem = {"float32": 4 * dim, "float16": 2 * dim, "int8": dim + 4}[vector_format]
+        print(f"{vector_format:<8} {mem:>9} {json_bytes:>9.0f} {baseline_json / json_bytes:>5.1f}x {recall:>10.3f} "
+              f"{top1:>6.3f} {max_err:>10.5f} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+bench_replay.py (offline throughput and retry behaviour of the fetchers, via http_replay.py)
+
+Starts the stand-in server on a recording and runs each pipeline step against it in a
+fresh interpreter (PMC_HTTP_ORIGIN set, HTTP cache off), once per fault profile:
+
+  scrape     scraper/newest_scraper.py on the recording's CSV
+  fix        newUtils.py fix_corrections (--workers)
+  summarize  get_sums_and_vecs' page fetch + section extraction for every link (the
+             Gemini calls go through Google's client, not http_client, so they are
+             not part of the replay)
+
+and reports wall time, items/s, requests, retries and failures from each stage's
+metrics/<stage>.json, plus what the stand-in served. Fault draws are seeded, so two
+runs of a profile see the same 429s and 503s.
+
+Without --recording, a synthetic recording is built from benchmarks/fixtures: --papers
+efetch articles and article pages (every 10th a correction notice, every 20th a 404),
+and a CSV linking them with a few duplicate rows.
+
+Usage:
+  python benchmarks/bench_replay.py
+  python benchmarks/bench_replay.py --papers 500 --client-rate off --workers 16
+  PMC_HTTP_RECORD=rec PMC_CACHE=off python cli.py fix -i SB_publication_PMC.csv --dry-run
+  python benchmarks/bench_replay.py --recording rec --csv SB_publication_PMC.csv
+"""
+
+import argparse
+import copy
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+FIXTURES = os.path.join(HERE, "fixtures")
+sys.path.insert(0, ROOT)
+
+from lxml import etree
+
+from http_replay import Recording, StandIn, serve
+
+EFETCH = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+FIRST_ID = 9100000
+
+# name -> StandIn fault settings
+PROFILES = {
+    "clean": {},
+    "latency": {"latency": 0.15, "jitter": 0.05},
+    "faults": {"latency": 0.05, "jitter": 0.02, "error_rate": 0.05, "throttle_rate": 0.1, "retry_after": 0.2},
+}
+
+SUMMARIZE_PAGES = """
+import csv, sys
+import metrics
+from get_sums_and_vecs import scrape_text
+from http_cache import cached_get
+from pipeline import ordered_map
+
+with open(sys.argv[1], newline="", encoding="utf-8") as f:
+    links = [row["Link"] for row in csv.DictReader(f)]
+
+def fetch(link):
+    return cached_get(link, timeout=30)
+
+with metrics.stage("summarize"):
+    for i, response in enumerate(ordered_map(fetch, links, workers=int(sys.argv[2]))):
+        if response.status_code == 200:
+            scrape_text(response, i)
+            metrics.count("items")
+        else:
+            metrics.count("fetch_failures")
+"""
+
+
+def synthesize(directory: str, papers: int):
+    """Write a synthetic recording and its CSV; returns the CSV path."""
+    recording = Recording(directory)
+    templates = etree.parse(os.path.join(FIXTURES, "efetch_articleset.xml")).getroot().findall("article")
+    with open(os.path.join(FIXTURES, "pmc_article.html"), encoding="utf-8") as f:
+        page = f.read()
+    with open(os.path.join(FIXTURES, "pmc_correction.html"), encoding="utf-8") as f:
+        correction = f.read()
+    page_title = "Spaceflight alters bone and muscle gene expression in mice"
+
+    articleset = etree.Element("pmc-articleset")
+    rows = []
+    for i in range(papers):
+        pmcid = f"PMC{FIRST_ID + i}"
+        title = f"Synthetic paper {i}: {page_title}"
+        article = copy.deepcopy(templates[i % len(templates)])
+        for aid in article.iter("article-id"):
+            if aid.get("pub-id-type") in ("pmc", "pmcid"):
+                aid.text = pmcid if aid.get("pub-id-type") == "pmcid" else pmcid[3:]
+        article.find(".//article-title").text = title
+        articleset.append(article)
+
+        if i % 10 == 9:
+            # a correction notice pointing at the previous paper
+            html = correction.replace("PMC3000001", f"PMC{FIRST_ID + i - 1}").replace(page_title, title)
+        else:
+            html = page.replace(page_title, title)
+        for url in (f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/", f"https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/"):
+            status = 404 if i % 20 == 19 else 200
+            recording.add("GET", url, None, status, "utf-8", html.encode("utf-8") if status == 200 else b"Not Found")
+        rows.append((title, f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/"))
+    recording.add("POST", EFETCH, {"db": "pmc", "id": "synthetic"}, 200, "UTF-8", etree.tostring(articleset))
+
+    # a few rows twice, so fix_corrections has duplicate groups to check
+    rows += rows[: max(1, papers // 25)]
+    csv_path = os.path.join(directory, "papers.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Title", "Link"])
+        writer.writerows(rows)
+    return csv_path
+
+
+def server_stats(origin: str):
+    with urllib.request.urlopen(origin + "/__stats") as r:
+        return json.load(r)
+
+
+def run_step(step: str, csv_path: str, workdir: str, env: dict, workers: int):
+    shutil.copy(csv_path, os.path.join(workdir, "SB_publication_PMC.csv"))
+    if step == "scrape":
+        argv = [os.path.join(ROOT, "scraper", "newest_scraper.py")]
+    elif step == "fix":
+        argv = [os.path.join(ROOT, "newUtils.py"), "-i", "SB_publication_PMC.csv", "-o", "fixed.csv",
+                "--workers", str(workers)]
+    else:
+        argv = ["-c", SUMMARIZE_PAGES, "SB_publication_PMC.csv", str(workers)]
+    env = {**env, "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "scraper")])}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *argv], cwd=workdir, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"{step} failed:\n{proc.stderr[-3000:]}")
+    with open(os.path.join(workdir, "metrics", f"{step}.json"), encoding="utf-8") as f:
+        return wall, json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetchers offline against the http_replay stand-in.")
+    parser.add_argument("--recording", help="Recording directory (default: synthesize one from the fixtures)")
+    parser.add_argument("--csv", help="Input CSV (Title, Link) for --recording")
+    parser.add_argument("--papers", type=int, default=200, help="Papers in the synthetic recording")
+    parser.add_argument("--steps", default="scrape,fix,summarize", help="Comma-separated steps to run")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated fault profiles: " + ", ".join(PROFILES))
+    parser.add_argument("--workers", type=int, default=8, help="--workers for fix, threads for the summarize page fetch")
+    parser.add_argument("--client-rate", default="20", help='PMC_HTTP_RATE for the pipeline (per-host req/s, "off" for none)')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_replay_")
+    try:
+        if args.recording:
+            if not args.csv:
+                raise SystemExit("--recording needs --csv")
+            recording_dir, csv_path = args.recording, os.path.abspath(args.csv)
+        else:
+            recording_dir = os.path.join(scratch, "recording")
+            csv_path = synthesize(recording_dir, args.papers)
+        recording = Recording(recording_dir)
+        print(f"recording: {len(recording.entries())} responses, {len(recording.articles())} efetch articles\n")
+
+        print(f"{'step':<10} {'profile':<8} {'wall s':>7} {'items/s':>8} {'requests':>9} {'retries':>8} "
+              f"{'failures':>9}  stand-in")
+        for profile in args.profiles.split(","):
+            standin = StandIn(recording, seed=args.seed, **PROFILES[profile])
+            server = serve(standin)
+            origin = f"http://127.0.0.1:{server.server_address[1]}"
+            env = {**os.environ, "PMC_HTTP_ORIGIN": origin, "PMC_CACHE": "off", "PMC_HTTP_RATE": args.client_rate}
+            env.pop("PMC_HTTP_RECORD", None)
+            try:
+                for step in args.steps.split(","):
+                    workdir = os.path.join(scratch, f"{profile}-{step}")
+                    os.makedirs(workdir)
+                    before = server_stats(origin)
+                    wall, m = run_step(step, csv_path, workdir, env, args.workers)
+                    after = server_stats(origin)
+                    http = m["http"].values()
+                    served = {k: after[k] - before[k] for k in after if after[k] != before[k] and k != "requests"}
+                    print(f"{step:<10} {profile:<8} {wall:>7.2f} {m['items_per_second']:>8.1f} "
+                          f"{sum(h['requests'] for h in http):>9} {sum(h['retries'] for h in http):>8} "
+                          f"{sum(h['failures'] for h in http):>9}  "
+                          + ", ".join(f"{k} {n}" for k, n in served.items()))
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+bench_xml_extract.py (BeautifulSoup double parse vs single-pass lxml extraction)
+
+For every <article> in an efetch XML file, compares:
+  bs4     - parse_metadata_from_xml() + a second BeautifulSoup tree for find_all("ref")
+            (what newest_scraper did per paper before the single-pass extractor)
+  lxml    - pmc_xml.parse_article_metadata(), one iterparse pass
+and reports CPU time and peak traced memory per article. Outputs are checked to be
+identical before anything is timed.
+
+Usage:
+  python benchmarks/bench_xml_extract.py
+  python benchmarks/bench_xml_extract.py --fixture saved_efetch.xml --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scraper"))
+
+from bs4 import BeautifulSoup
+
+import newest_scraper
+from pmc_xml import split_articleset, parse_article_metadata
+
+DEFAULT_FIXTURE = os.path.join(HERE, "fixtures", "efetch_articleset.xml")
+
+
+def bs4_metadata(xml):
+    title, authors, year, journal = newest_scraper.parse_metadata_from_xml(xml)
+    soup = BeautifulSoup(xml, "lxml-xml")
+    refs = []
+    for ref in soup.find_all("ref"):
+        for p in newest_scraper.extract_pmcids_from_ref_node(ref):
+            if p not in refs:
+                refs.append(p)
+    return {"title": title, "authors": authors, "year": year, "journal": journal, "references": refs}
+
+
+def measure(fn, xml, repeat):
+    """Return (cpu seconds per call, peak traced bytes for one call)."""
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(xml)
+    cpu = (time.process_time() - start) / repeat
+
+    tracemalloc.start()
+    fn(xml)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PMC XML metadata extraction backends.")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="efetch XML (<pmc-articleset> or single article)")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed calls per article and backend")
+    args = parser.parse_args()
+
+    articles = list(split_articleset(args.fixture))
+    if not articles:
+        raise SystemExit(f"No <article> elements in {args.fixture}")
+
+    print(f"{'pmcid':<12} {'KB':>6} {'bs4 ms':>8} {'lxml ms':>8} {'speedup':>8} {'bs4 KB':>8} {'lxml KB':>8} {'mem x':>6}")
+    totals = [0.0, 0.0, 0, 0]
+    for pmcid, xml in articles:
+        if bs4_metadata(xml) != parse_article_metadata(xml):
+            raise SystemExit(f"{pmcid}: single-pass output differs from the bs4 extractors")
+        bs_cpu, bs_peak = measure(bs4_metadata, xml, args.repeat)
+        lx_cpu, lx_peak = measure(parse_article_metadata, xml, args.repeat)
+        totals = [totals[0] + bs_cpu, totals[1] + lx_cpu, totals[2] + bs_peak, totals[3] + lx_peak]
+        print(f"{pmcid or '?':<12} {len(xml) / 1024:>6.0f} {bs_cpu * 1000:>8.2f} {lx_cpu * 1000:>8.2f} "
+              f"{bs_cpu / lx_cpu:>7.1f}x {bs_peak / 1024:>8.0f} {lx_peak / 1024:>8.0f} {bs_peak / lx_peak:>5.1f}x")
+
+    n = len(articles)
+    print(f"\nper article (mean of {n}): bs4 {totals[0] / n * 1000:.2f} ms / {totals[2] / n / 1024:.0f} KB peak, "
+          f"lxml {totals[1] / n * 1000:.2f} ms / {totals[3] / n / 1024:.0f} KB peak "
+          f"({totals[0] / totals[1]:.1f}x less CPU, {totals[2] / totals[3]:.1f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+build_data.py (build the dataset the client bundles from the merged records)
+
+Reads the merged NDJSON records (newMerge.py) and writes them as the single JSON object
+the client imports (client/src/data/unified_data.json, see client/src/utils/graph-data.ts).
+A "label" already in that file (label_generator.js) is carried over to the new build.
+
+--vector-format float16 or int8 shrinks the embeddings the client downloads and scans
+(see vector_store.export_vector; benchmarks/bench_quantization.py for the recall cost).
+int8 records also get a "vector_scale"; cosine ranking works on the int8 values as is.
+
+--neighbors K (default 10, 0 = off) precomputes each paper's K most similar papers
+(cosine over the full-precision embeddings, vector_search.all_top_k) and writes them
+into its record as "similar" (ids, best first) and "similar_scores", so the client
+looks similar papers up instead of scanning every vector (the "Similar Papers" list in
+PaperInfoBox). Only papers in the dataset are candidates. The vectors come from the
+--vectors store (get_sums_and_vecs.py), or from the records' own "vector" fields when
+that store does not exist.
+
+Usage:
+  python build_data.py
+  python build_data.py -i merged_data.ndjson -o ../client/src/data/unified_data.json
+  python build_data.py --vector-format int8 --neighbors 20
+"""
+
+import argparse
+import os
+
+import metrics
+from ndjson_io import iter_records, write_json_object
+from vector_store import VECTOR_FORMATS, VectorStore, export_vector
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INPUT = "merged_data.ndjson"
+VECTORS = "ai_vectors"
+NEIGHBORS = 10
+# the dataset client/src/utils/graph-data.ts imports
+CLIENT_OUTPUT = os.path.join(REPO_ROOT, "client", "src", "data", "unified_data.json")
+
+
+def similar_papers(input_path: str, vectors_path: str, k: int) -> dict:
+    """{id: {"similar": [...], "similar_scores": [...]}} for every record that has a vector."""
+    import numpy as np
+    from vector_search import all_top_k, normalize
+
+    if vectors_path and os.path.isdir(vectors_path):
+        store = VectorStore(vectors_path)
+        rows = store.index()
+        ids = [record_id for record_id, _ in iter_records(input_path) if record_id in rows]
+        # one gather from the memory-mapped matrix, in dataset order
+        matrix = store.matrix()[[rows[record_id] for record_id in ids]]
+    else:
+        pairs = [(record_id, record["vector"]) for record_id, record in iter_records(input_path) if record.get("vector")]
+        ids = [record_id for record_id, _ in pairs]
+        matrix = np.array([vector for _, vector in pairs], dtype=np.float32)
+    if not ids:
+        return {}
+
+    neighbors = {}
+    with metrics.timer("neighbors"):
+        for start, rows, sims in all_top_k(normalize(matrix), k):
+            for offset, (row_ids, row_sims) in enumerate(zip(rows.tolist(), sims.tolist())):
+                neighbors[ids[start + offset]] = {
+                    "similar": [ids[r] for r in row_ids],
+                    "similar_scores": [round(s, 4) for s in row_sims],
+                }
+    return neighbors
+
+
+def existing_labels(output_path: str) -> dict:
+    """{id: label} from a previous build of the client dataset, so a rebuild keeps them."""
+    if not os.path.exists(output_path):
+        return {}
+    return {record_id: record["label"] for record_id, record in iter_records(output_path) if record.get("label")}
+
+
+def export_records(records, vector_format: str, neighbors: dict = None, labels: dict = None):
+    for record_id, record in records:
+        if labels and record_id in labels:
+            record.setdefault("label", labels[record_id])
+        if vector_format != "float32" and record.get("vector") is not None:
+            record.update(export_vector(record["vector"], vector_format))
+        if neighbors and record_id in neighbors:
+            record.update(neighbors[record_id])
+        yield record_id, record
+
+
+@metrics.stage("build")
+def build(input_path: str, output_path: str, vector_format: str = "float32", neighbors: int = NEIGHBORS,
+          vectors_path: str = VECTORS) -> int:
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    similar = similar_papers(input_path, vectors_path, neighbors) if neighbors else None
+    labels = existing_labels(output_path)
+    count = write_json_object(output_path, export_records(iter_records(input_path), vector_format, similar, labels))
+    metrics.count("items", count)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the merged paper records out as the client's JSON dataset.")
+    parser.add_argument("-i", "--input", default=INPUT, help="Merged records (NDJSON, or a legacy .json object)")
+    parser.add_argument("-o", "--output", default=CLIENT_OUTPUT, help="Client dataset to write")
+    parser.add_argument("--vector-format", choices=VECTOR_FORMATS, default="float32",
+                        help="How embeddings are written: full precision, float16, or int8 with a per-vector scale")
+    parser.add_argument("--neighbors", type=int, default=NEIGHBORS, help="Write each paper's K most similar papers into its record (0 = off)")
+    parser.add_argument("--vectors", default=VECTORS, help="Vector store for --neighbors (else the records' 'vector' fields)")
+    args = parser.parse_args(argv)
+
+    count = build(args.input, args.output, args.vector_format, args.neighbors, args.vectors)
+    print(f"Wrote {count} papers to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
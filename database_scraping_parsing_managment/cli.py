@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+cli.py (one entry point for every pipeline step)
+
+  scrape     PMC metadata + references for the CSV papers     (scraper/newest_scraper.py)
+  fix        correction links, duplicate and near-duplicate check (newUtils.py)
+  summarize  Gemini summaries + embeddings                     (get_sums_and_vecs.py)
+  merge      join summaries/vectors into the paper records     (newMerge.py)
+  build      write the client's JSON dataset                   (build_data.py)
+
+Only the chosen step's module is imported, and the steps import their heavy
+dependencies (pandas, bs4, google.generativeai, numpy) inside the functions that use
+them, so `--help` and argument errors return at once and a missing API key only
+matters to `summarize`. benchmarks/bench_cli_import.py guards this.
+
+Usage (from this directory):
+  python cli.py --help
+  python cli.py fix --help
+  python cli.py scrape --resume
+  python cli.py fix -i SB_publication_PMC.csv -o SB_publication_PMC_fixed.csv --workers 8
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (module, entry point, help)
+COMMANDS = {
+    "scrape": ("newest_scraper", "main", "Scrape PMC metadata and reference PMCIDs for the CSV papers"),
+    "fix": ("newUtils", "main_cli", "Fix correction links and check duplicate / near-duplicate titles"),
+    "summarize": ("get_sums_and_vecs", "main", "Summarize and embed every paper with Gemini"),
+    "merge": ("newMerge", "main", "Merge summaries and vectors into the paper records"),
+    "build": ("build_data", "main", "Write the merged records out as the client dataset"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Space Treesearch data pipeline.",
+                                     epilog="Run `cli.py <command> --help` for a command's options.")
+    sub = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, _, help_text) in COMMANDS.items():
+        # the step's own parser handles its options (and its --help)
+        sub.add_parser(name, help=help_text, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    module_name, entry, _ = COMMANDS[args.command]
+    for path in (HERE, os.path.join(HERE, "scraper")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    module = importlib.import_module(module_name)
+    sys.argv[0] = f"cli.py {args.command}"
+    return getattr(module, entry)(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+dedupe.py (corpus-wide near-duplicate detection with MinHash + LSH)
+
+Comparing every title against every other title is O(n^2) SequenceMatcher calls. Here
+each document's token set gets a MinHash signature (NUM_PERM min-hashes; the fraction
+of equal positions between two signatures estimates the Jaccard similarity of the token
+sets). Signatures are cut into BANDS bands and hashed into buckets, so only documents
+sharing at least one whole band become candidate pairs - near-linear in corpus size.
+The caller's exact check then runs on the candidates only.
+
+With 128 permutations in 32 bands of 4 rows, a pair with Jaccard similarity s becomes
+a candidate with probability 1 - (1 - s^4)^32: ~0.3 at s=0.3, ~0.96 at s=0.5, and
+effectively 1 from s=0.6 up.
+
+Usage:
+  pairs = near_duplicates(docs, tokenize=tokenize_for_overlap, is_match=titles_similar)
+"""
+
+import itertools
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+SEED = 1
+
+
+class MinHasher:
+    """
+    MinHash over token sets. Tokens are hashed with crc32 (stable across runs) and then
+    through NUM_PERM multiply-shift hash functions h(x) = ((a*x + b) mod 2^64) >> 32.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens):
+        """uint32 signature of a non-empty token set."""
+        x = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+        return ((x[:, None] * self.a + self.b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+def estimated_jaccard(sig_a, sig_b) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+
+class LSHIndex:
+    """Band buckets over MinHash signatures; candidate_pairs() lists keys sharing a bucket."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+
+    def add(self, key, signature):
+        for band, buckets in enumerate(self.buckets):
+            buckets[signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(key)
+
+    def candidate_pairs(self):
+        """Set of (key_a, key_b) pairs, key_a inserted before key_b, sharing any bucket."""
+        pairs = set()
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                for a, b in itertools.combinations(keys, 2):
+                    pairs.add((a, b))
+        return pairs
+
+
+def near_duplicates(docs, tokenize, is_match, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = SEED):
+    """
+    docs is an iterable of (key, text). Returns [(key_a, key_b, estimated_jaccard)] for
+    the LSH candidate pairs that pass is_match(text_a, text_b), in document order.
+    Documents whose token set is empty are skipped.
+    """
+    hasher = MinHasher(num_perm, seed)
+    index = LSHIndex(num_perm, bands)
+    texts, signatures, position = {}, {}, {}
+    for key, text in docs:
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        texts[key] = text
+        signatures[key] = hasher.signature(tokens)
+        position[key] = len(position)
+        index.add(key, signatures[key])
+
+    matches = []
+    for a, b in sorted(index.candidate_pairs(), key=lambda p: (position[p[0]], position[p[1]])):
+        if is_match(texts[a], texts[b]):
+            matches.append((a, b, estimated_jaccard(signatures[a], signatures[b])))
+    return matches
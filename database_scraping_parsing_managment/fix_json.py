@@ -1,67 +1,76 @@
 import json
 
+from ndjson_io import RecordWriter
+
+# Older runs of get_sums_and_vecs.py appended one indented JSON object per batch to
+# ai_json.json, which is not valid JSON as a whole. This converts such a file into
+# line-delimited records. New runs write ai_json.ndjson directly and need no fixing.
+# Vectors now live in a vector store; `python vector_store.py import <output> ai_vectors
+# --summaries ai_json.ndjson` moves them out of the converted records.
+
 # --- CONFIGURATION ---
 # 1. Set the name of your broken input file.
-malformed_file_path = 'ai_json.json' 
+malformed_file_path = 'ai_json.json'
 
 # 2. Set the name for the new, corrected output file.
-corrected_file_path = 'fixed_summary_vector.json'
-# ---------------------
+corrected_file_path = 'fixed_summary_vector.ndjson'
 
+# 3. How much of the input to read at a time.
+chunk_size = 1024 * 1024
+# ---------------------
 
-# A dictionary to hold all the merged data
-merged_data = {}
 
 print(f"Attempting to read and fix '{malformed_file_path}'...")
 
 try:
-    with open(malformed_file_path, 'r', encoding='utf-8') as f:
-        # Read the entire file content into a single string
-        raw_text = f.read()
-
-    # If the file is empty or just whitespace, stop.
-    if not raw_text.strip():
-        print("File is empty. No action taken.")
-        exit()
-
     # Create a JSONDecoder instance to parse objects one at a time
     decoder = json.JSONDecoder()
-    
-    # Start scanning from the beginning of the string
-    position = 0
 
-    # Loop until we've scanned the entire string
-    while position < len(raw_text):
-        try:
+    # Only the unparsed tail of the file is kept in memory (at most one batch object)
+    buffer = ""
+    at_eof = False
+    written = 0
+
+    with open(malformed_file_path, 'r', encoding='utf-8') as f, RecordWriter(corrected_file_path) as out:
+        while True:
             # Find the start of the next JSON object, skipping any whitespace
-            obj_start = raw_text.find('{', position)
+            obj_start = buffer.find('{')
             if obj_start == -1:
-                # No more JSON objects found
-                break
+                buffer = ""
+            else:
+                buffer = buffer[obj_start:]
+                try:
+                    # Use raw_decode to parse one object and find where it ends
+                    python_obj, end_index = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    python_obj = None
+                    if at_eof:
+                        # This can happen if there's trailing text that isn't valid JSON.
+                        # We'll stop here, having processed all valid objects.
+                        print(f"Warning: Encountered non-JSON data at the end of the file. Stopping parse.")
+                        break
+                if python_obj is not None:
+                    # Write every paper of the batch object as its own line
+                    for item_id, value in python_obj.items():
+                        out.write(item_id, value)
+                        written += 1
+                    buffer = buffer[end_index:]
+                    continue
 
-            # Use raw_decode to parse one object and find where it ends
-            # It returns the Python object and the index of the character after the object
-            python_obj, end_index = decoder.raw_decode(raw_text[obj_start:])
-            
-            # Merge the newly found object into our main dictionary
-            merged_data.update(python_obj)
-            
-            # Move the position marker to the end of the object we just processed
-            position = obj_start + end_index
-
-        except json.JSONDecodeError:
-            # This can happen if there's trailing text that isn't valid JSON.
-            # We'll stop here, having processed all valid objects.
-            print(f"Warning: Encountered non-JSON data at the end of the file. Stopping parse.")
-            break
-            
-    # Write the clean, merged data to the new file
-    with open(corrected_file_path, 'w', encoding='utf-8') as f_out:
-        json.dump(merged_data, f_out, indent=4, ensure_ascii=False)
+            if at_eof:
+                break
+            # The next object is not complete yet; read more of the file
+            chunk = f.read(chunk_size)
+            if not chunk:
+                at_eof = True
+            buffer += chunk
 
-    print(f"✅ Success! All JSON objects have been merged into '{corrected_file_path}'.")
+    if written == 0:
+        print("File is empty. No action taken.")
+    else:
+        print(f"✅ Success! {written} records from all JSON objects were written to '{corrected_file_path}'.")
 
 except FileNotFoundError:
     print(f"Error: The file '{malformed_file_path}' was not found.")
 except Exception as e:
-    print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+    print(f"An unexpected error occurred: {e}")
@@ -1,40 +1,76 @@
 # Copyright 2025 Joshua Williams
 
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+import argparse
+import functools
 import os
-import json
-import time
 
-# api configurations
-from dotenv import load_dotenv
-import google.generativeai as genai
+import llm_cache
+import metrics
+from http_cache import cached_get
+from ndjson_io import RecordWriter, iter_records
+from parsers import extract_sections
+from pipeline import Batcher, ordered_map
+from rate_limit import QuotaLimiter
+from vector_store import VectorStore
+
+# api configurations (set up by configure(); google.generativeai and pandas are slow to
+#   import, so they are only loaded once summarizing actually starts)
+genai = None
+model = None
+quota_errors = ()
+MODEL_NAME = "gemini-2.5-flash-lite"
+vector_model = "gemini-embedding-001"
+TASK_TYPE = "RETRIEVAL_DOCUMENT"
+PROMPT = "Please provide a summary in around 500 characters and have 3 bullet points of the biggest takeways of the following text:\n\n{text}"
 
-load_dotenv()
+# gemini-2.5-flash-lite quotas (free tier by default); summaries run at whichever binds first
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", 15))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", 250_000))
+SUMMARY_WORKERS = 4     # summaries in flight; the quota limiter sets the actual pace
+MAX_LLM_RETRIES = 6     # 429s tolerated per summary before giving up
+OUTPUT_TOKENS = 400     # expected summary length, for the pre-call token estimate
+summary_quota = QuotaLimiter(GEMINI_RPM, GEMINI_TPM)
 
-api_key = os.getenv('GOOGLE_API_KEY')
+# gemini-embedding-001: at most 100 texts per embed_content call
+EMBED_BATCH = 100
+EMBED_IDLE_SECONDS = 20.0   # embed a partial batch once summaries stop arriving for this long
+EMBED_RPM = float(os.getenv("GEMINI_EMBED_RPM", 100))
+EMBED_TPM = float(os.getenv("GEMINI_EMBED_TPM", 30_000))
+embed_quota = QuotaLimiter(EMBED_RPM, EMBED_TPM)
 
-if not api_key:
-    raise ValueError("API key not found")
+# the csv file to read the urls from
+INPUT_CSV = "SB_publication_PMC_fixed.csv"
 
-genai.configure(api_key=api_key)
 
-model = genai.GenerativeModel("gemini-2.5-flash-lite")
-vector_model = "gemini-embedding-001"
+def configure():
+    global genai, model, quota_errors
+    from dotenv import load_dotenv
+    import google.generativeai
+    from google.api_core import exceptions as api_errors
+
+    load_dotenv()
+
+    api_key = os.getenv('GOOGLE_API_KEY')
+
+    if not api_key:
+        raise ValueError("API key not found")
+
+    genai = google.generativeai
+    genai.configure(api_key=api_key)
 
-# loading in the csv file to read the urls
-df = pd.read_csv("SB_publication_PMC_fixed.csv")
+    model = genai.GenerativeModel(MODEL_NAME)
+    # what the API raises for HTTP 429 (quota exceeded)
+    quota_errors = (api_errors.ResourceExhausted, api_errors.TooManyRequests)
 
 # set user-agent
 headers = {
     'User-Agent': "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
 }
 
-# json filename
-JSON = "ai_json.json"
-
-results = {}
+# outputs: one {"id", "summary"} line per paper (see ndjson_io.py), and the embeddings as
+#   float32 rows in a vector store (see vector_store.py)
+JSON = "ai_json.ndjson"
+VECTORS = "ai_vectors"
 
 # gets id of the paper from the link
 def get_id(link):
@@ -44,99 +80,135 @@ def get_id(link):
             id = split_link[i]
     return id
 
+# run one gemini call once `quota` (RPM and TPM) has room for about `estimate` tokens;
+#   a 429 backs every worker off and retries, and the real usage (when reported) is settled afterwards
+def quota_call(quota, estimate, call, timer):
+    for attempt in range(MAX_LLM_RETRIES + 1):
+        with metrics.timer("llm_quota_wait"):
+            ticket = quota.acquire(estimate)
+        try:
+            with metrics.timer(timer):
+                response = call()
+        except quota_errors:
+            metrics.count("llm_throttled")
+            if attempt == MAX_LLM_RETRIES:
+                raise
+            quota.throttled()
+            continue
+        usage = getattr(response, "usage_metadata", None)
+        quota.settle(ticket, getattr(usage, "total_token_count", None) or None)
+        return response
+
 # call gemini api to get a summary given scraped information
+#   (memoized in llm_cache by model, prompt template and text, so unchanged papers cost no call)
 def get_summary(text):
-    prompt = f"Please provide a summary in around 500 characters and have 3 bullet points of the biggest takeways of the following text:\n\n{text}"
-    summary = model.generate_content(prompt)
+    cache = llm_cache.default_cache()
+    key = llm_cache.summary_key(MODEL_NAME, PROMPT, text)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.count("summary_cache_hits")
+            return cached
+    prompt = PROMPT.format(text=text)
+    # about 4 characters per token
+    summary = quota_call(summary_quota, len(prompt) / 4 + OUTPUT_TOKENS, lambda: model.generate_content(prompt), "llm_summary")
+    record_token_usage(summary)
+    if cache is not None:
+        cache.put(key, "summary", summary.text)
     return summary.text
 
+# embed one batch of (id, summary) pairs and append them to the outputs (runs on the Batcher's thread)
+#   vectors are memoized in llm_cache by model, task type and summary; only the misses are sent
+def embed_and_write(out, store, batch):
+    cache = llm_cache.default_cache()
+    keys = [llm_cache.vector_key(vector_model, TASK_TYPE, summary) for _, summary in batch]
+    known = cache.get_many(keys) if cache is not None else {}
+    metrics.count("vector_cache_hits", sum(key in known for key in keys))
+    missing = list(dict.fromkeys(summary for (_, summary), key in zip(batch, keys) if key not in known))
+    if missing:
+        result = quota_call(
+            embed_quota,
+            sum(len(summary) for summary in missing) / 4,
+            lambda: genai.embed_content(model=vector_model, content=missing, task_type=TASK_TYPE),
+            "llm_embedding",
+        )
+        vectors = result['embedding']
+        # one vector per text, in order; anything else would pair papers with the wrong vectors
+        if len(vectors) != len(missing):
+            raise ValueError(f"embed_content returned {len(vectors)} vectors for {len(missing)} summaries")
+        new = {llm_cache.vector_key(vector_model, TASK_TYPE, summary): vector for summary, vector in zip(missing, vectors)}
+        if cache is not None:
+            cache.put_many(new.items(), "vector")
+        known.update(new)
+        metrics.count("embedded_texts", len(missing))
+    # vectors first: a summary line is only written once its vector is stored
+    store.append([id for id, _ in batch], [known[key] for key in keys])
+    for id, summary in batch:
+        out.write(id, {"summary": summary})
+        metrics.count("items")
+
+# count the tokens Gemini reports for a response (prompt, output and total)
+def record_token_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    metrics.count("llm_requests")
+    metrics.count("llm_prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0)
+    metrics.count("llm_output_tokens", getattr(usage, "candidates_token_count", 0) or 0)
+    metrics.count("llm_total_tokens", getattr(usage, "total_token_count", 0) or 0)
+
 # getting together all of the text to be handed over to the gemini api
+#   (parsing lives in parsers.extract_sections: lxml fast path, BeautifulSoup fallback)
 def scrape_text(response, index):
-    # create a BeautifulSoup object to parse the HTML
-    soup = BeautifulSoup(response.content, 'html.parser')
-
-    # key words to look for to create ai summary
-    key_words = ["abstract", "summary", "result", "conclu"] 
-
-    api_string = ""
-
-    # find headers for the key words
-    all_matching_headers = soup.find_all(
-        'h2',
-        string=lambda text: text and any(key in text.lower() for key in key_words)
-    )
-
-    all_matching_headers3 = soup.find_all(
-        'h3',
-        string=lambda text: text and any(key in text.lower() for key in key_words)
-    )
-
-    valid_headers = all_matching_headers + all_matching_headers3
-
-    title = soup.select_one('title')
-    if title:
-        api_string = "Title: " + str(title.get_text(strip=True)) + "\n"
-    else:
-        api_string = "Title:\n"
+    title, api_string = extract_sections(response.content)
+    if title is None:
         print("Title not found.")
 
     # print out progressive results 
-    print(f'{index + 1}. {title.get_text(strip=True)}\n')
-
-    if len(valid_headers) > 0:
-
-        header_id_map = {}
-        for header_tag in valid_headers:
-            parent_section = header_tag.find_parent('section')
-
-            if parent_section and parent_section.get('id'):
-                # header text is what definitively contains the keywords at this point
-                header_text = header_tag.string.strip()
-                section_id = parent_section.get('id')
-
-                # possibly useless
-                header_id_map[header_text] = section_id
-            else:
-                print("no parents or ids")
-
-        # to avoid overloading tokens, if the paper has two of the below sections, then it only gives one
-        #   to the ai
-        if "abstract" in header_id_map.keys() and "summary" in header_id_map.keys():
-            del header_id_map["summary"]
-        if "result" in header_id_map.keys() and "conclu" in header_id_map.keys():
-            del header_id_map["conclu"]
-
-        for header_text, header_id in header_id_map.items():
-            # some sites have periods which cannot be properly parsed as is
-            if '.' in header_id:
-                header_id = header_id.replace('.', '\\.')
-
-            # get the paragraphs just from the sections with the ids corresponding to the proper label
-            #   and concatenate these into appropriate sections
-            selector = f'section#{header_id} p'
-            paragraphs = soup.select(selector)
-            api_string += f"\n{header_text} Section:\n"
-            
-            if paragraphs:
-                for p in paragraphs:
-                    api_string += p.get_text(strip=True)
-            else:
-                print("no direct child p found")
-    else:
-        # if there are no sections then get the 10th-25th paragraphs to get a rough selection of the paper
-        possible_paragraphs = soup.select("p")
-        for i, para in enumerate(possible_paragraphs):
-            if i > 10 and i < 25:
-                para_text = para.get_text().strip()
-                api_string = api_string + "\n" + para_text
+    print(f'{index + 1}. {title}\n')
 
     return api_string
 
-def main():
-    # batch variables
-    current_batch_count = 0
-    batch_ids = []
-    batch_sums = []
+# {id: summary} already in the output whose vector is in the store (the latest line per id);
+#   a re-run skips these papers when their summary comes out the same, instead of appending them again
+def stored_summaries(output_path, store):
+    if not os.path.exists(output_path):
+        return {}
+    rows = store.index()
+    return {id: record.get("summary") for id, record in iter_records(output_path, tolerate_torn_tail=True) if id in rows}
+
+# fetch, parse and summarize one CSV row (runs on a worker thread)
+def summarize_link(job):
+    i, link = job
+    # fetch the HTML content of the page (served from the shared cache after the first run)
+    response = cached_get(link, headers=headers)
+    if response.status_code != 200:
+        return i, link, response.status_code, None
+    with metrics.timer("parse"):
+        api_string = scrape_text(response, i)
+    if api_string is None:
+        return i, link, response.status_code, None
+    return i, link, response.status_code, get_summary(api_string)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize every paper in the CSV with Gemini and embed the summaries.")
+    parser.add_argument("-i", "--input", default=INPUT_CSV, help="CSV with a Link column")
+    parser.add_argument("-o", "--output", default=JSON, help="NDJSON file to append {id, summary} records to")
+    parser.add_argument("--vectors", default=VECTORS, help="Vector store directory to append the embeddings to")
+    parser.add_argument("--workers", type=int, default=SUMMARY_WORKERS, help="Papers fetched and summarized at once (paced by the RPM/TPM quota)")
+    parser.add_argument("--rpm", type=float, default=GEMINI_RPM, help="Gemini requests/minute quota for summaries")
+    parser.add_argument("--tpm", type=float, default=GEMINI_TPM, help="Gemini tokens/minute quota for summaries")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="Summaries per embed_content call")
+    args = parser.parse_args(argv)
+    summarize(args)
+
+@metrics.stage("summarize")
+def summarize(args):
+    global summary_quota
+    configure()
+    summary_quota = QuotaLimiter(args.rpm, args.tpm)
+    import pandas as pd
+    df = pd.read_csv(args.input)
 
     start_index = 0
     # with open(JSON, 'r', encoding='utf-8') as f:
@@ -144,66 +216,32 @@ def main():
     #     start_index = len(results)
 
     print(f'start index: {start_index}')
-    for i, link in enumerate(df['Link'], start=start_index):
-
-        current_batch_count += 1
-
-        id = get_id(link)
-        batch_ids.append(id)
-
-        # fetch the HTML content of the page
-        response = requests.get(link, headers=headers)
-
-        # if the page loads properly
-        if response.status_code == 200:
-            api_string = scrape_text(response, i)
-
-            if api_string is None:
-                continue
-
-            summary = get_summary(api_string)
-
-            batch_sums.append(summary)
-            # 12 was chosen so that 
-            if current_batch_count >= 12:
-
-                global results
-
-                result = genai.embed_content(
-                    model=vector_model,
-                    content=batch_sums,
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-                vectors = result['embedding']
-
-                for j in range(current_batch_count):
-                    new_paper = {
-                        batch_ids[j]: {
-                            "summary": batch_sums[j],
-                            "vector": vectors[j]
-                        }
-                    }
-                    
-                    results.update(new_paper)
-                
-                # reset batch variables
-                current_batch_count = 0
-                batch_ids = []
-                batch_sums = []
-
-                with open(JSON, "a", encoding="utf-8") as f:
-                    json.dump(results, f, indent=2, ensure_ascii=False)
-                    f.write('\n')
-
-                # clear the results dict, since results are already saved to json
-                results = {}
-
-            # get token overflow after about 15 tpm
-            if i % 12 == 0 and i != 0:
-                time.sleep(60)
-
-        else:
-            print(f"Failed to retrieve page. Status code: {response.status_code}")
+    # pages are fetched and summarized on worker threads; results come back in CSV order.
+    #   Only papers that got a summary are queued for embedding, so ids and vectors always
+    #   pair up; the batcher embeds full batches as they fill and the rest on idle or at the end.
+    #   Both outputs are appended batch by batch, so they are valid after every batch.
+    #   A paper whose summary is already stored unchanged (a re-run) is not appended again.
+    jobs = enumerate(df['Link'], start=start_index)
+    store = VectorStore(args.vectors)
+    stored = stored_summaries(args.output, store)
+    with RecordWriter(args.output, append=True) as out, \
+            Batcher(functools.partial(embed_and_write, out, store), max_size=args.embed_batch, idle_timeout=EMBED_IDLE_SECONDS) as embedder:
+        for i, link, status_code, summary in ordered_map(summarize_link, jobs, workers=args.workers):
+
+            # if the page loads properly
+            if status_code == 200:
+                if summary is None:
+                    continue
+                id = get_id(link)
+                if stored.get(id) == summary:
+                    metrics.count("unchanged")
+                    continue
+                stored[id] = summary
+                embedder.put((id, summary))
+
+            else:
+                print(f"Failed to retrieve page. Status code: {status_code}")
+                metrics.count("fetch_failures")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,316 @@
+"""
+http_cache.py (shared on-disk HTTP response cache for every pipeline fetcher)
+
+newest_scraper, newUtils and get_sums_and_vecs all fetch the same PMC pages and efetch
+XML. Routing them through this cache means only the first run (or the first pipeline
+stage) goes to NCBI; everything after that is read from local disk. Misses are sent
+through the pooled, rate-limited client in http_client.py.
+
+Layout (under CACHE_DIR):
+  index.sqlite               key -> status, encoding, size, created, last_access
+  objects/ab/<key>.gz        gzip-compressed response body
+
+  - key is the SHA-256 of the normalized request (method, URL, sorted params/form data).
+    api_key is left out so cached entries are shared with and without an NCBI key.
+  - entries older than the TTL are treated as misses and refetched
+  - when the cache grows past its size budget the least recently used bodies are evicted
+  - bodies are written to a temp file and renamed into place, and the index lives in
+    SQLite (WAL mode), so concurrent threads and processes can read and write safely
+  - only 200 responses are stored
+
+Config (environment):
+  PMC_CACHE_DIR      cache directory (default .http_cache in the working directory)
+  PMC_CACHE_TTL      seconds an entry stays fresh (default 7 days)
+  PMC_CACHE_MAX_MB   size budget for compressed bodies (default 1024)
+  PMC_CACHE          set to "off" to bypass the cache entirely
+  PMC_HTTP_RECORD    also write every response read here (hit or miss) to this
+                     directory, for replaying offline (http_replay.py)
+
+Usage:
+  r = cached_get(url, headers=HEADERS, timeout=30)
+  with cached_stream("POST", EFETCH, params=params, timeout=120) as body:
+      for pmcid, meta in iter_article_metadata(body): ...
+"""
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from http_client import default_client
+from http_replay import default_recording
+
+CACHE_DIR = os.getenv("PMC_CACHE_DIR", ".http_cache")
+DEFAULT_TTL = float(os.getenv("PMC_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_BYTES = int(float(os.getenv("PMC_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("PMC_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+# request fields that never change the response body
+IGNORED_PARAMS = {"api_key"}
+READ_CHUNK = 64 * 1024
+
+
+def request_key(method: str, url: str, params=None) -> str:
+    """SHA-256 of the normalized request; api_key and param order do not matter."""
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    raw = json.dumps([method.upper(), url, items], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """The small slice of requests.Response the pipeline uses."""
+
+    def __init__(self, content: bytes, status_code: int, url: str, encoding: str = None, from_cache: bool = False):
+        self.content = content
+        self.status_code = status_code
+        self.url = url
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if not 200 <= self.status_code < 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+    @classmethod
+    def from_requests(cls, r):
+        return cls(r.content, r.status_code, r.url, r.encoding or r.apparent_encoding)
+
+
+class ResponseCache:
+    def __init__(self, root: str = CACHE_DIR, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, url TEXT, status INTEGER, encoding TEXT,"
+                " size INTEGER, created REAL, last_access REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+
+    # ---------- storage ----------
+    def _db(self):
+        # sqlite connections cannot be shared between threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=60)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, "objects", key[:2], key + ".gz")
+
+    def _lookup(self, key: str):
+        """Return (status, encoding) for a fresh entry whose body exists, else None."""
+        db = self._db()
+        row = db.execute("SELECT status, encoding, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        status, encoding, created = row
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        if not os.path.exists(self._path(key)):
+            with db:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        with db:
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return status, encoding
+
+    def _commit(self, key: str, url: str, status: int, encoding: str, tmp_path: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, url, status, encoding, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, encoding, os.path.getsize(path), now, now),
+            )
+        self.evict()
+
+    def _tmp_path(self, key: str) -> str:
+        return os.path.join(self.root, "objects", f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    # ---------- public api ----------
+    def get(self, method: str, url: str, params=None):
+        """Return a CachedResponse for a fresh entry, or None on a miss."""
+        key = request_key(method, url, params)
+        hit = self._lookup(key)
+        if hit is None:
+            return None
+        try:
+            with gzip.open(self._path(key), "rb") as f:
+                content = f.read()
+        except (OSError, EOFError):
+            return None
+        return CachedResponse(content, hit[0], url, hit[1], from_cache=True)
+
+    def put(self, method: str, url: str, params, response: CachedResponse):
+        if response.status_code != 200:
+            return
+        key = request_key(method, url, params)
+        tmp = self._tmp_path(key)
+        with gzip.open(tmp, "wb") as f:
+            f.write(response.content)
+        self._commit(key, url, response.status_code, response.encoding, tmp)
+
+    def open_body(self, method: str, url: str, params=None):
+        """File-like gzip reader over a fresh entry's body, or None on a miss."""
+        key = request_key(method, url, params)
+        if self._lookup(key) is None:
+            return None
+        try:
+            return gzip.open(self._path(key), "rb")
+        except OSError:
+            return None
+
+    def evict(self):
+        """Drop least recently used bodies until the cache fits in max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+            with db:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+class _TeeReader:
+    """Read a streamed body, counting bytes and optionally copying it into gzip temp files."""
+
+    def __init__(self, raw, *sinks):
+        self.raw = raw
+        self.sinks = [sink for sink in sinks if sink is not None]
+        self.nbytes = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        if data:
+            self.nbytes += len(data)
+            for sink in self.sinks:
+                sink.write(data)
+        return data
+
+    def drain(self):
+        """Read anything the consumer did not need so every stored copy of the body is complete."""
+        while self.read(READ_CHUNK):
+            pass
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide ResponseCache configured from the environment (None when disabled)."""
+    global _default
+    if not CACHE_ENABLED:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = ResponseCache()
+    return _default
+
+
+def _send(method: str, url: str, params, headers, timeout, stream=False):
+    client = default_client()
+    if method.upper() == "POST":
+        return client.request("POST", url, data=params, headers=headers, timeout=timeout, stream=stream)
+    return client.request(method, url, params=params, headers=headers, timeout=timeout, stream=stream)
+
+
+def cached_get(url: str, params=None, headers=None, timeout=30, cache=None, method="GET"):
+    """
+    GET (or POST form `params`) through the shared cache. Misses go out through the
+    pooled, rate-limited http_client. Network errors propagate; non-200 responses are
+    returned but never stored.
+    """
+    cache = cache or default_cache()
+    if cache is not None:
+        hit = cache.get(method, url, params)
+        if hit is not None:
+            _record(method, url, params, hit)
+            return hit
+    response = CachedResponse.from_requests(_send(method, url, params, headers, timeout))
+    if cache is not None:
+        cache.put(method, url, params, response)
+    _record(method, url, params, response)
+    return response
+
+
+def _record(method: str, url: str, params, response: CachedResponse):
+    recording = default_recording()
+    if recording is not None:
+        recording.add(method, url, params, response.status_code, response.encoding, response.content)
+
+
+def _recorded_body(method: str, url: str, params, status: int, encoding=None):
+    recording = default_recording()
+    if recording is None or status != 200:
+        return contextlib.nullcontext()
+    return recording.body_sink(method, url, params, status, encoding)
+
+
+@contextlib.contextmanager
+def cached_stream(method: str, url: str, params=None, headers=None, timeout=120, cache=None):
+    """
+    Yield a file-like body for a (possibly large) response without holding it in memory.
+    On a hit the body is decompressed from disk as it is read. On a miss the network
+    stream is read directly and copied into the cache, which is only committed if the
+    consumer read the whole body without raising. HTTP errors raise requests.HTTPError.
+    """
+    cache = cache or default_cache()
+    if cache is not None:
+        body = cache.open_body(method, url, params)
+        if body is not None:
+            with body, _recorded_body(method, url, params, 200) as record:
+                tee = _TeeReader(body, record)
+                yield tee
+                if tee.sinks:
+                    tee.drain()
+            return
+    r = _send(method, url, params, headers, timeout, stream=True)
+    with r, _recorded_body(method, url, params, r.status_code, r.encoding) as record:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        tee = _TeeReader(r.raw, record)
+        try:
+            if cache is None or r.status_code != 200:
+                yield tee
+                if tee.sinks:
+                    tee.drain()
+                return
+            key = request_key(method, url, params)
+            tmp = cache._tmp_path(key)
+            try:
+                with gzip.open(tmp, "wb") as sink:
+                    tee.sinks.append(sink)
+                    yield tee
+                    tee.drain()
+                cache._commit(key, url, r.status_code, r.encoding, tmp)
+            finally:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(tmp)
+        finally:
+            default_client().add_bytes(url, tee.nbytes)
@@ -0,0 +1,204 @@
+"""
+http_client.py (one pooled, rate-limited, instrumented HTTP client for NCBI and PMC)
+
+Every fetcher in the pipeline goes through default_client() (via http_cache.py), so:
+  - connections are pooled and kept alive per host (one requests.Session each), which
+    saves a TCP + TLS handshake on every call after the first
+  - each host has its own token bucket: eutils follows NCBI's quota (3 req/s, or 10 with
+    NCBI_API_KEY), the PMC article pages get a polite 3 req/s, other hosts are unlimited
+  - 429 and 5xx responses and connection errors are retried with full-jitter exponential
+    backoff, honouring Retry-After when the server sends one
+  - per-host counters (requests, retries, failures, status codes, bytes, latency
+    histogram) are kept for reporting via stats(); metrics.py adds them to each stage's
+    run metrics
+  - with PMC_HTTP_ORIGIN set, requests go to that server instead (http_replay.py's
+    stand-in), keeping the real host's rate limit and stats; PMC_HTTP_RATE overrides
+    every host's rate ("off" for none), e.g. to find the pipeline's own ceiling
+
+Usage:
+  r = default_client().request("GET", url, params=params, timeout=30)
+  print(default_client().stats())
+"""
+
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Histogram
+from rate_limit import TokenBucket, ncbi_rate
+
+USER_AGENT = "Mozilla/5.0 (compatible; space-treesearch-pipeline/1.0)"
+DEFAULT_TIMEOUT = 30
+POOL_SIZE = 16          # keep-alive connections per host (>= worker threads)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5      # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# requests/second per host; None = no limit
+PMC_PAGE_RATE = 3.0
+
+# e.g. http://127.0.0.1:8800 to replay a recording (http_replay.py serve); None = real hosts
+ORIGIN = os.getenv("PMC_HTTP_ORIGIN")
+RATE_OVERRIDE = os.getenv("PMC_HTTP_RATE")
+
+
+def default_host_rate(host: str):
+    if RATE_OVERRIDE:
+        return None if RATE_OVERRIDE.lower() in ("off", "0", "none") else float(RATE_OVERRIDE)
+    if host == "eutils.ncbi.nlm.nih.gov":
+        # read lazily so a .env loaded by the calling script is honoured
+        return ncbi_rate(os.getenv("NCBI_API_KEY"))
+    if host in ("pmc.ncbi.nlm.nih.gov", "www.ncbi.nlm.nih.gov"):
+        return PMC_PAGE_RATE
+    return None
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency = Histogram()
+        self.statuses = {}
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "latency_avg_s": self.latency_total / self.requests if self.requests else 0.0,
+            "latency_max_s": self.latency_max,
+            "latency_histogram": self.latency.as_dict(),
+            "statuses": dict(self.statuses),
+        }
+
+
+class HttpClient:
+    def __init__(self, host_rate=default_host_rate, max_retries: int = MAX_RETRIES, pool_size: int = POOL_SIZE,
+                 origin: str = ORIGIN):
+        self.host_rate = host_rate
+        self.origin = origin.rstrip("/") if origin else None
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._limiters = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    # ---------- per-host state ----------
+    def _host_state(self, host: str):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                self._sessions[host] = session
+                rate = self.host_rate(host)
+                self._limiters[host] = TokenBucket(rate) if rate else None
+                self._stats[host] = HostStats()
+            return session, self._limiters[host], self._stats[host]
+
+    def _record(self, stats: HostStats, status=None, latency=None, nbytes=0, retry=False, failed=False):
+        with self._lock:
+            if latency is not None:
+                stats.requests += 1
+                stats.latency_total += latency
+                stats.latency_max = max(stats.latency_max, latency)
+                stats.latency.observe(latency)
+            if status is not None:
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.bytes += nbytes
+            stats.retries += int(retry)
+            stats.failures += int(failed)
+
+    def add_bytes(self, url: str, nbytes: int):
+        """Count body bytes read later from a streamed response."""
+        _, _, stats = self._host_state(urlparse(url).netloc)
+        self._record(stats, nbytes=nbytes)
+
+    def _route(self, url: str, headers):
+        """Point a request at the stand-in origin, telling it which host it was meant for."""
+        if self.origin is None:
+            return url, headers
+        parts = urlsplit(url)
+        target = self.origin + parts.path + (f"?{parts.query}" if parts.query else "")
+        return target, {**(headers or {}), "X-Replay-Host": parts.netloc, "X-Replay-Scheme": parts.scheme}
+
+    # ---------- requests ----------
+    @staticmethod
+    def _backoff(attempt: int, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(BACKOFF_CAP, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def request(self, method: str, url: str, params=None, data=None, headers=None, timeout=DEFAULT_TIMEOUT, stream=False):
+        """
+        Send one request through the host's pooled session and rate limit, retrying
+        429/5xx and connection errors. Returns the final requests.Response (which may
+        still be an error status); raises the last exception if every attempt failed.
+        """
+        host = urlparse(url).netloc
+        session, limiter, stats = self._host_state(host)
+        url, headers = self._route(url, headers)
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            start = time.monotonic()
+            try:
+                r = session.request(method, url, params=params, data=data, headers=headers, timeout=timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(stats, latency=time.monotonic() - start, retry=attempt < self.max_retries,
+                             failed=attempt == self.max_retries)
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            nbytes = 0 if stream else len(r.content)
+            retry = r.status_code in RETRY_STATUSES and attempt < self.max_retries
+            self._record(stats, status=r.status_code, latency=time.monotonic() - start, nbytes=nbytes, retry=retry,
+                         failed=r.status_code in RETRY_STATUSES and not retry)
+            if not retry:
+                return r
+            r.close()
+            time.sleep(self._backoff(attempt, r))
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """{host: counters} snapshot."""
+        with self._lock:
+            return {host: s.as_dict() for host, s in self._stats.items()}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Process-wide HttpClient shared by every fetcher."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+    return _default
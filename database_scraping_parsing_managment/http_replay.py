@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+http_replay.py (record NCBI/PMC responses to disk, replay them from a local stand-in server)
+
+Lets the fetchers (newest_scraper, newUtils.fix_corrections, get_sums_and_vecs) be run
+and load-tested offline and deterministically.
+
+Record: with PMC_HTTP_RECORD set, every response the pipeline reads through
+http_cache.py (cache hits included) is also written to that directory:
+
+  responses.ndjson     one line per response: key, method, url, status, encoding
+                       (a key recorded twice keeps its last line)
+  bodies/ab/<key>.gz   gzip-compressed body
+
+  key is the SHA-256 of the normalized request (method, scheme/host/path, sorted query
+  and form fields without api_key), so it can be rebuilt from what a server receives.
+  Streamed bodies (efetch batches) are only recorded when they were read completely
+  with a 200 status.
+
+Replay: `serve` answers from a recording. With PMC_HTTP_ORIGIN pointing at it,
+http_client.py sends every request there instead of the real host (keeping the real
+host's rate limit and stats); the original host travels in the X-Replay-Host header.
+
+  - an efetch request that was not recorded as-is is assembled from the recorded
+    <article> elements of its ids, so replays work with any batch size or crawl order
+  - anything else that was not recorded gets a 404
+  - faults are injected per request: --latency/--jitter (seconds), --error-rate
+    (503s), --throttle-rate (429s with Retry-After) and --max-rps (per host token
+    bucket, 429 when empty). Random faults are drawn from (seed, request, nth time it
+    was asked for), so a replay fails the same requests the same way on every run
+    whatever the thread interleaving; --max-rps is timing dependent by nature.
+  - GET /__stats returns the server's counters as JSON
+
+Usage:
+  PMC_HTTP_RECORD=recordings/fix PMC_CACHE=off python cli.py fix -i SB_publication_PMC.csv --dry-run
+  python http_replay.py info recordings/fix
+  python http_replay.py serve recordings/fix --port 8800 --latency 0.2 --jitter 0.05 --throttle-rate 0.1
+  PMC_HTTP_ORIGIN=http://127.0.0.1:8800 PMC_CACHE=off python cli.py fix -i SB_publication_PMC.csv --dry-run
+"""
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from rate_limit import TokenBucket
+
+RECORD_DIR = os.getenv("PMC_HTTP_RECORD")
+INDEX = "responses.ndjson"
+
+# request fields that never change the response body (same as http_cache)
+IGNORED_PARAMS = {"api_key"}
+PMC_DIGITS_RE = re.compile(r"^(?:PMC)?(\d+)$", re.I)
+ARTICLESET_OPEN = b'<?xml version="1.0" ?>\n<pmc-articleset>'
+ARTICLESET_CLOSE = b"</pmc-articleset>\n"
+
+
+def replay_key(method: str, url: str, params=None) -> str:
+    """
+    SHA-256 of the normalized request. `params` (a dict or (name, value) pairs) are
+    merged with the URL's own query, so the client side and the server side (which
+    only sees the final query string and form body) get the same key.
+    """
+    parts = urlsplit(url)
+    pairs = parse_qsl(parts.query, keep_blank_values=True)
+    pairs += list(params.items()) if isinstance(params, dict) else list(params or ())
+    items = sorted((str(k), str(v)) for k, v in pairs if k not in IGNORED_PARAMS)
+    raw = json.dumps([method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}", items], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_efetch(url: str) -> bool:
+    return urlsplit(url).path.endswith("/efetch.fcgi")
+
+
+class Recording:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._entries = None    # key -> index entry, loaded on first lookup
+        self._articles = None   # pmcid -> <article> bytes from recorded efetch bodies
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.root, "bodies", key[:2], key + ".gz")
+
+    # ---------- recording ----------
+    def _append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, INDEX), "a", encoding="utf-8") as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries[entry["key"]] = entry
+
+    def add(self, method: str, url: str, params, status: int, encoding: str, content: bytes):
+        with self.body_sink(method, url, params, status, encoding) as sink:
+            sink.write(content)
+
+    @contextlib.contextmanager
+    def body_sink(self, method: str, url: str, params, status: int, encoding: str):
+        """Yield a writable gzip file for the body; the entry is only added if the block exits cleanly."""
+        key = replay_key(method, url, params)
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp, "wb") as sink:
+                yield sink
+            os.replace(tmp, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+        self._append({"key": key, "method": method.upper(), "url": url, "status": status, "encoding": encoding})
+
+    # ---------- replay ----------
+    def entries(self) -> dict:
+        with self._lock:
+            if self._entries is None:
+                self._entries = {}
+                path = os.path.join(self.root, INDEX)
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                self._entries[entry["key"]] = entry
+            return self._entries
+
+    def lookup(self, method: str, url: str, params=None):
+        """(entry, body bytes) for a recorded request, or None."""
+        entry = self.entries().get(replay_key(method, url, params))
+        if entry is None:
+            return None
+        with gzip.open(self._body_path(entry["key"]), "rb") as f:
+            return entry, f.read()
+
+    def articles(self) -> dict:
+        if self._articles is None:
+            from pmc_xml import split_articleset
+
+            articles = {}
+            for entry in list(self.entries().values()):
+                if entry["status"] == 200 and is_efetch(entry["url"]):
+                    with gzip.open(self._body_path(entry["key"]), "rb") as body:
+                        for pmcid, xml in split_articleset(body):
+                            if pmcid:
+                                articles[pmcid] = xml.encode("utf-8")
+            self._articles = articles
+        return self._articles
+
+    def efetch_articleset(self, ids: str):
+        """Assemble a <pmc-articleset> for a comma-separated id list, or None if no id was recorded."""
+        articles = self.articles()
+        found = []
+        for raw in ids.split(","):
+            m = PMC_DIGITS_RE.match(raw.strip())
+            if m and "PMC" + m.group(1) in articles:
+                found.append(articles["PMC" + m.group(1)])
+        if not found:
+            return None
+        return ARTICLESET_OPEN + b"\n".join(found) + ARTICLESET_CLOSE
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_recording():
+    """Process-wide Recording for PMC_HTTP_RECORD (None when not recording)."""
+    global _default
+    if not RECORD_DIR:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = Recording(RECORD_DIR)
+    return _default
+
+
+# ---------- stand-in server ----------
+class StandIn:
+    """Decides every reply: recorded body, assembled efetch, 404, or an injected fault."""
+
+    def __init__(self, recording: Recording, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 max_rps=None, retry_after=1.0, seed=0):
+        self.recording = recording
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.seed = seed
+        self._seen = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "assembled": 0, "missing": 0, "throttled": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _nth(self, key: str) -> int:
+        with self._lock:
+            n = self._seen.get(key, 0)
+            self._seen[key] = n + 1
+            self.stats["requests"] += 1
+            return n
+
+    def _bucket(self, host: str):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.max_rps)
+            return self._buckets[host]
+
+    def respond(self, method: str, url: str, params):
+        """(status, headers, body) for one request."""
+        key = replay_key(method, url, params)
+        rng = random.Random(f"{self.seed}:{key}:{self._nth(key)}")
+        throttled = rng.random() < self.throttle_rate
+        failed = rng.random() < self.error_rate
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, rng.gauss(self.latency, self.jitter)))
+
+        if throttled or (self.max_rps and not self._bucket(urlsplit(url).netloc).try_acquire()):
+            self._count("throttled")
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, b"Too Many Requests"
+        if failed:
+            self._count("errors")
+            return 503, {}, b"Service Unavailable"
+
+        hit = self.recording.lookup(method, url, params)
+        if hit is not None:
+            entry, body = hit
+            self._count("served")
+            charset = f"; charset={entry['encoding']}" if entry.get("encoding") else ""
+            content_type = ("text/xml" if is_efetch(url) else "text/html") + charset
+            return entry["status"], {"Content-Type": content_type}, body
+        if is_efetch(url):
+            body = self.recording.efetch_articleset(dict(params).get("id", ""))
+            if body is not None:
+                self._count("assembled")
+                return 200, {"Content-Type": "text/xml; charset=UTF-8"}, body
+        self._count("missing")
+        return 404, {"Content-Type": "text/plain"}, b"Not Found"
+
+
+def _handler(standin: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, so the client's pooled sessions behave as they do against NCBI
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, headers: dict, body: bytes):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _handle(self):
+            parts = urlsplit(self.path)
+            if parts.path == "/__stats":
+                with standin._lock:
+                    body = json.dumps(standin.stats).encode("utf-8")
+                return self._reply(200, {"Content-Type": "application/json"}, body)
+            params = parse_qsl(parts.query, keep_blank_values=True)
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                form = self.rfile.read(length).decode("utf-8", errors="replace")
+                params += parse_qsl(form, keep_blank_values=True)
+            host = self.headers.get("X-Replay-Host") or self.headers.get("Host", "")
+            scheme = self.headers.get("X-Replay-Scheme", "https")
+            self._reply(*standin.respond(self.command, f"{scheme}://{host}{parts.path}", params))
+
+        do_GET = do_POST = do_HEAD = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(standin: StandIn, host: str = "127.0.0.1", port: int = 0):
+    """Start the stand-in on a daemon thread; returns the server (server_address has the real port)."""
+    server = ThreadingHTTPServer((host, port), _handler(standin))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- cli ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a recording or replay it from a local stand-in server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="Summarize a recording")
+    info.add_argument("recording", help="Recording directory (PMC_HTTP_RECORD of the recorded run)")
+    srv = sub.add_parser("serve", help="Replay a recording with injected latency and faults")
+    srv.add_argument("recording", help="Recording directory (PMC_HTTP_RECORD of the recorded run)")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8800)
+    srv.add_argument("--latency", type=float, default=0.0, help="Mean seconds before every reply")
+    srv.add_argument("--jitter", type=float, default=0.0, help="Standard deviation of the latency (seconds)")
+    srv.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    srv.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    srv.add_argument("--max-rps", type=float, default=None, help="Per-host requests/second before 429s (like NCBI's quota)")
+    srv.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with every 429")
+    srv.add_argument("--seed", type=int, default=0, help="Seed for the injected faults")
+    args = parser.parse_args(argv)
+
+    recording = Recording(args.recording)
+    if args.command == "info":
+        entries = recording.entries().values()
+        hosts = {}
+        for entry in entries:
+            host = urlsplit(entry["url"]).netloc
+            hosts.setdefault(host, {}).setdefault(entry["status"], 0)
+            hosts[host][entry["status"]] += 1
+        print(f"{len(entries)} responses, {len(recording.articles())} efetch articles")
+        for host, statuses in sorted(hosts.items()):
+            print(f"  {host}: " + ", ".join(f"{n} x {status}" for status, n in sorted(statuses.items())))
+        return
+
+    standin = StandIn(recording, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      throttle_rate=args.throttle_rate, max_rps=args.max_rps, retry_after=args.retry_after, seed=args.seed)
+    server = serve(standin, args.host, args.port)
+    print(f"Replaying {len(recording.entries())} responses from {args.recording} on "
+          f"http://{server.server_address[0]}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+llm_cache.py (persistent memo of Gemini summaries and embeddings, keyed by content)
+
+get_sums_and_vecs re-reads every paper on each run. Summaries and vectors are stored
+here under a hash of everything that determines them, so a re-run only pays for LLM
+calls where an input actually changed:
+
+  summary   sha256(model, prompt template, extracted api_string)
+  vector    sha256(vector model, task type, summary text)
+
+A new prompt or model therefore misses naturally; nothing needs to be invalidated by
+hand. Values are kept as JSON (vectors round-trip exactly) in one SQLite table in WAL
+mode, with one connection per thread, so the summary workers and the embedding
+batcher can read and write it at the same time.
+
+Config (environment):
+  LLM_CACHE_DIR   cache directory (default .llm_cache in the working directory)
+  LLM_CACHE       set to "off" to always call the API
+
+Usage:
+  cache = default_cache()
+  key = summary_key(MODEL_NAME, PROMPT, api_string)
+  summary = cache.get(key)
+  if summary is None:
+      summary = ...
+      cache.put(key, "summary", summary)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+
+def _key(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def summary_key(model: str, prompt_template: str, text: str) -> str:
+    return _key("summary", model, prompt_template, text)
+
+
+def vector_key(model: str, task_type: str, text: str) -> str:
+    return _key("vector", model, task_type, text)
+
+
+class LLMCache:
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self._local = threading.local()
+        os.makedirs(root, exist_ok=True)
+        with self._db() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, kind TEXT, value TEXT, created REAL)")
+
+    def _db(self):
+        # sqlite connections cannot be shared between threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "llm.sqlite"), timeout=60)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str):
+        """The stored value, or None on a miss."""
+        row = self._db().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys) -> dict:
+        """{key: value} for the keys that are stored."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db().execute(
+                f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def put(self, key: str, kind: str, value):
+        self.put_many([(key, value)], kind)
+
+    def put_many(self, items, kind: str):
+        now = time.time()
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO entries (key, kind, value, created) VALUES (?, ?, ?, ?)",
+                [(key, kind, json.dumps(value), now) for key, value in items],
+            )
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide LLMCache configured from the environment (None when disabled)."""
+    global _default
+    if not CACHE_ENABLED:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = LLMCache()
+    return _default
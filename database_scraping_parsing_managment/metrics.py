@@ -0,0 +1,247 @@
+"""
+metrics.py (per-stage run metrics: JSON summary + Prometheus textfile)
+
+Each pipeline stage runs inside stage(name) (a context manager, also usable as a
+decorator). While it is active, code anywhere in the process can record into it:
+
+  count(name, n)        counters: items, deletions, LLM tokens, ...
+  observe(name, secs)   latency histograms (LATENCY_BUCKETS)
+  timer(name)           context manager that observes its own duration
+
+When the stage ends, the HTTP client's per-host counters for the run (requests,
+retries, failures, status codes, bytes, latency histogram; see http_client.py) are
+added, and two files are written to METRICS_DIR:
+
+  <stage>.json   summary for comparing runs
+  <stage>.prom   Prometheus text format, for node_exporter's textfile collector
+                 (--collector.textfile.directory=METRICS_DIR)
+
+Recording outside a stage is a no-op (e.g. in process-pool workers), so instrumented
+helpers stay usable on their own. The counter "items" drives items_per_second.
+
+Config:
+  PIPELINE_METRICS_DIR   output directory (default "metrics")
+
+Usage:
+  @metrics.stage("fix")
+  def fix_corrections(...):
+      with metrics.timer("parse"):
+          ...
+      metrics.count("items")
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv("PIPELINE_METRICS_DIR", "metrics")
+PREFIX = "treesearch"
+
+# seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self):
+        return {"le": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+def histogram_delta(after: dict, before: dict = None):
+    """Difference of two Histogram.as_dict() snapshots (before may be missing)."""
+    if not before:
+        return dict(after)
+    return {
+        "le": after["le"],
+        "counts": [a - b for a, b in zip(after["counts"], before["counts"])],
+        "sum": after["sum"] - before["sum"],
+        "count": after["count"] - before["count"],
+    }
+
+
+def _http_snapshot():
+    # only look at the client if something already imported it; the merge/build stages
+    # never touch the network and should not pay for importing requests
+    http_client = sys.modules.get("http_client")
+    return http_client.default_client().stats() if http_client else {}
+
+
+def _http_delta(after: dict, before: dict):
+    delta = {}
+    for host, stats in after.items():
+        prev = before.get(host, {})
+        d = {key: stats[key] - prev.get(key, 0) for key in ("requests", "retries", "failures", "bytes")}
+        d["statuses"] = {code: n - prev.get("statuses", {}).get(code, 0) for code, n in stats["statuses"].items()}
+        d["statuses"] = {code: n for code, n in d["statuses"].items() if n}
+        d["latency"] = histogram_delta(stats["latency_histogram"], prev.get("latency_histogram"))
+        if d["requests"] or d["bytes"]:
+            delta[host] = d
+    return delta
+
+
+class StageMetrics:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.counters = {}
+        self.histograms = {}
+        self.status = "running"
+        self.started_at = time.time()
+        self.duration = None
+        self.http = {}
+        self._t0 = time.monotonic()
+        self._http_before = _http_snapshot()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def finish(self, status: str = "ok"):
+        self.duration = time.monotonic() - self._t0
+        self.status = status
+        self.http = _http_delta(_http_snapshot(), self._http_before)
+
+    # ---------- exports ----------
+    def summary(self):
+        items = self.counters.get("items", 0)
+        return {
+            "stage": self.stage,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_s": self.duration,
+            "items_per_second": items / self.duration if self.duration else 0.0,
+            "counters": dict(self.counters),
+            "timers": {name: h.as_dict() for name, h in self.histograms.items()},
+            "http": self.http,
+        }
+
+    def prometheus(self):
+        lines = []
+        stage = _label_value(self.stage)
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+                lines.append(f"{PREFIX}_{name}{suffix}{{{label_text}}} {_number(value)}")
+
+        def histogram_samples(hist: dict, labels: dict):
+            cumulative = 0
+            for le, n in zip(list(hist["le"]) + ["+Inf"], hist["counts"]):
+                cumulative += n
+                yield "_bucket", {**labels, "le": le}, cumulative
+            yield "_sum", labels, hist["sum"]
+            yield "_count", labels, hist["count"]
+
+        summary = self.summary()
+        metric("stage_success", "gauge", "1 if the last run of the stage finished without an exception.",
+               [("", {"stage": stage}, int(self.status == "ok"))])
+        metric("stage_last_run_timestamp_seconds", "gauge", "Start time of the last run of the stage.",
+               [("", {"stage": stage}, self.started_at)])
+        metric("stage_duration_seconds", "gauge", "Wall time of the last run of the stage.",
+               [("", {"stage": stage}, self.duration)])
+        metric("stage_items_per_second", "gauge", "Items processed per second in the last run.",
+               [("", {"stage": stage}, summary["items_per_second"])])
+        metric("stage_count", "gauge", "Stage counters (items, tokens, deletions, ...) for the last run.",
+               [("", {"stage": stage, "name": name}, n) for name, n in sorted(self.counters.items())])
+        metric("stage_timer_seconds", "histogram", "Durations observed by the stage (parse, batches, LLM calls, ...).",
+               [s for name, h in sorted(self.histograms.items()) for s in histogram_samples(h.as_dict(), {"stage": stage, "name": name})])
+        hosts = sorted(self.http.items())
+        for key in ("requests", "retries", "failures", "bytes"):
+            metric(f"http_{key}", "gauge", f"HTTP {key} per host in the last run of the stage.",
+                   [("", {"stage": stage, "host": host}, d[key]) for host, d in hosts])
+        metric("http_responses", "gauge", "HTTP responses per host and status code in the last run of the stage.",
+               [("", {"stage": stage, "host": host, "status": code}, n) for host, d in hosts for code, n in sorted(d["statuses"].items())])
+        metric("http_request_duration_seconds", "histogram", "HTTP request latency per host in the last run of the stage.",
+               [s for host, d in hosts for s in histogram_samples(d["latency"], {"stage": stage, "host": host})])
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str = None):
+        directory = directory or METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.stage)
+        _write_atomic(base + ".json", json.dumps(self.summary(), indent=2) + "\n")
+        # node_exporter may read the directory at any moment; never expose a partial file
+        _write_atomic(base + ".prom", self.prometheus())
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _write_atomic(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# ---------- the active stage ----------
+_current = None
+
+
+@contextmanager
+def stage(name: str, directory: str = None):
+    """Collect metrics for one stage run and write them out when it ends (even on error)."""
+    global _current
+    m = StageMetrics(name)
+    previous, _current = _current, m
+    status = "error"
+    try:
+        yield m
+        status = "ok"
+    finally:
+        _current = previous
+        m.finish(status)
+        m.write(directory)
+
+
+def current():
+    return _current
+
+
+def count(name: str, n=1):
+    if _current is not None:
+        _current.count(name, n)
+
+
+def observe(name: str, seconds: float):
+    if _current is not None:
+        _current.observe(name, seconds)
+
+
+@contextmanager
+def timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
@@ -0,0 +1,181 @@
+"""
+ndjson_io.py (line-delimited record files for every intermediate pipeline artifact)
+
+Each line is one paper: {"id": "PMC123", ...fields}. Readers and writers handle one
+record at a time, so peak memory is a single record instead of the whole corpus (which
+matters once 3072-dim embedding vectors ride along with every paper).
+
+  iter_records(path)              stream (id, record); legacy .json objects still load
+  RecordWriter(path)              write records, renamed into place on success
+  RecordIndex(path)               id -> byte offset, so one file can be joined against
+                                  another without holding its records in memory
+  write_json_object(path, items)  stream records out as one {"id": record} JSON object
+                                  (the format the client bundles)
+
+Usage:
+  with RecordWriter("pmc_papers.ndjson") as out:
+      for pmcid, record in iter_records("pmc_papers.journal.ndjson"):
+          out.write(pmcid, record)
+"""
+
+import json
+import os
+
+ID_FIELD = "id"
+
+
+def encode_record(record_id: str, record: dict) -> str:
+    return json.dumps({ID_FIELD: record_id, **record}, ensure_ascii=False) + "\n"
+
+
+def decode_record(line):
+    obj = json.loads(line)
+    return obj.pop(ID_FIELD), obj
+
+
+def iter_records(path: str, tolerate_torn_tail: bool = False):
+    """
+    Yield (id, record) from an NDJSON file, one line at a time. With
+    tolerate_torn_tail a line cut short by a crash mid-write is skipped (journals).
+    A legacy .json object file ({"id": record, ...}) is loaded whole and iterated.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f).items()
+        return
+    # bytes, so a line cut inside a multibyte character fails in decode_record, not in the reader
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = decode_record(line.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                if not tolerate_torn_tail:
+                    raise
+                continue
+            yield record
+
+
+def _missing_final_newline(path: str) -> bool:
+    """True if path is non-empty and does not end in a newline (a torn last line)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class RecordWriter:
+    """
+    Write (id, record) lines. In the default mode the file is written next to its
+    final name and renamed into place on a clean close, so readers never see half a
+    file. append=True writes straight to the end of the file and flushes every line
+    (checkpoint journals).
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.append = append
+        self.count = 0
+        if append:
+            self._target = path
+            torn = _missing_final_newline(path)
+            self._f = open(path, "a", encoding="utf-8")
+            # make sure a torn last line does not swallow the first new record
+            if torn:
+                self._f.write("\n")
+        else:
+            self._target = path + ".tmp"
+            self._f = open(self._target, "w", encoding="utf-8")
+
+    def write(self, record_id: str, record: dict):
+        self._f.write(encode_record(record_id, record))
+        self.count += 1
+        if self.append:
+            self._f.flush()
+
+    def close(self, commit: bool = True):
+        self._f.close()
+        if self.append:
+            return
+        if commit:
+            os.replace(self._target, self.path)
+        elif os.path.exists(self._target):
+            os.remove(self._target)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def write_records(path: str, items) -> int:
+    """Write an iterable of (id, record) to path; returns the record count."""
+    with RecordWriter(path) as out:
+        for record_id, record in items:
+            out.write(record_id, record)
+    return out.count
+
+
+class RecordIndex:
+    """
+    Random access into an NDJSON file by id. Only ids and byte offsets are kept in
+    memory; each get() seeks and decodes a single line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = {}
+        self._f = open(path, "rb")
+        offset = 0
+        for line in self._f:
+            if line.strip():
+                self.offsets[json.loads(line)[ID_FIELD]] = offset
+            offset += len(line)
+
+    def __contains__(self, record_id):
+        return record_id in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, record_id, default=None):
+        offset = self.offsets.get(record_id)
+        if offset is None:
+            return default
+        self._f.seek(offset)
+        return decode_record(self._f.readline().decode("utf-8"))[1]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_json_object(path: str, items, indent: int = 2) -> int:
+    """
+    Stream (id, record) pairs out as a single JSON object {"id": record, ...} without
+    building it in memory. Renamed into place on success like RecordWriter.
+    """
+    tmp = path + ".tmp"
+    count = 0
+    pad = " " * indent
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("{")
+            for record_id, record in items:
+                body = json.dumps(record, indent=indent, ensure_ascii=False).replace("\n", "\n" + pad)
+                f.write(("," if count else "") + f"\n{pad}{json.dumps(record_id, ensure_ascii=False)}: {body}")
+                count += 1
+            f.write("\n}\n" if count else "}\n")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
@@ -1,51 +1,89 @@
 #!/usr/bin/env python3
 """
-Merge two JSON files keyed by ID (e.g., PMCID).
+Merge two record files keyed by ID (e.g., PMCID).
 
 Behavior:
  - Only merge entries from file2 if their ID already exists in file1.
  - Updates existing dictionaries in file1 with any new fields from file2.
  - Does NOT add new IDs from file2 that aren't in file1.
+ - Streams: file1 is read one record at a time and file2 is looked up by byte offset
+   (see ndjson_io.py), so peak memory is one record plus file2's id index.
+ - With a vector store (vector_store.py, written by get_sums_and_vecs.py), each merged
+   record also gets its "vector" field from the store's memory-mapped matrix.
+ - Writes merged_data.ndjson for later stages and merged_data.json (one JSON object)
+   for the client.
+ - Output of an older run (fix_json.py's fixed_summary_vector.ndjson, summaries and
+   vectors together) is merged by splitting it first:
+   `python vector_store.py import fixed_summary_vector.ndjson ai_vectors --summaries ai_json.ndjson`
 """
 
-import json
+import argparse
 import os
 
-file1_path = 'pmc_papers.json'            # base file (has correct IDs)
-file2_path = 'ai_fixed.json'  # supplemental file
-output_path = 'merged_data.json'
+import metrics
+from ndjson_io import RecordIndex, RecordWriter, iter_records, write_json_object
+from vector_store import VectorStore, vector_to_json
 
-if not os.path.exists(file1_path) or not os.path.exists(file2_path):
-    raise FileNotFoundError("One or both input files were not found.")
+file1_path = 'pmc_papers.ndjson'            # base file (has correct IDs)
+file2_path = 'ai_json.ndjson'   # summaries (get_sums_and_vecs.py)
+vectors_path = 'ai_vectors'     # vector store (merged in when it exists)
+output_path = 'merged_data.ndjson'
+client_output_path = 'merged_data.json'
 
-# Load both files
-with open(file1_path, 'r', encoding='utf-8') as f1:
-    data1 = json.load(f1)
-print(f"File1 loaded: {len(data1)} entries")
 
-with open(file2_path, 'r', encoding='utf-8') as f2:
-    data2 = json.load(f2)
-print(f"File2 loaded: {len(data2)} entries")
+@metrics.stage("merge")
+def merge(file1_path, file2_path, output_path, client_output_path, vectors_path=None):
+    if not os.path.exists(file1_path) or not os.path.exists(file2_path):
+        raise FileNotFoundError("One or both input files were not found.")
 
-# Merge only overlapping IDs
-merged_data = {}
-merged_count = 0
+    rows, matrix = {}, None
+    if vectors_path and os.path.isdir(vectors_path):
+        store = VectorStore(vectors_path)
+        rows, matrix = store.index(), store.matrix()
+        print(f"Vector store: {len(rows)} ids, dim {store.dim}")
 
-for item_id, value_dict in data1.items():
-    # Start with the base data
-    merged_data[item_id] = value_dict.copy()
+    # Index file2 (ids and offsets only)
+    with RecordIndex(file2_path) as data2:
+        print(f"File2 indexed: {len(data2)} entries")
 
-    # Merge only if the same ID exists in file2
-    if item_id in data2:
-        merged_data[item_id].update(data2[item_id])
-        merged_count += 1
+        # Merge only overlapping IDs
+        merged_count = 0
+        total = 0
 
-print(f"Merged {merged_count} overlapping entries (IDs present in both files).")
+        with RecordWriter(output_path) as out:
+            for item_id, value_dict in iter_records(file1_path):
+                # Merge only if the same ID exists in file2
+                if item_id in data2:
+                    value_dict.update(data2.get(item_id))
+                    merged_count += 1
+                    if item_id in rows:
+                        value_dict["vector"] = vector_to_json(matrix[rows[item_id]])
+                out.write(item_id, value_dict)
+                total += 1
+                metrics.count("items")
 
-# Write the merged JSON
-with open(output_path, 'w', encoding='utf-8') as f_out:
-    json.dump(merged_data, f_out, indent=2, ensure_ascii=False)
+    print(f"File1 streamed: {total} entries")
+    print(f"Merged {merged_count} overlapping entries (IDs present in both files).")
+    metrics.count("merged", merged_count)
 
-print(f" Successfully merged files into '{output_path}'")
-print(f"Total entries in output: {len(merged_data)}")
+    # Export the merged records as the single JSON object the client loads
+    with metrics.timer("client_export"):
+        write_json_object(client_output_path, iter_records(output_path))
 
+    print(f" Successfully merged files into '{output_path}' and '{client_output_path}'")
+    print(f"Total entries in output: {total}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge summaries/vectors into the scraped paper records by ID.")
+    parser.add_argument("--base", default=file1_path, help="Base record file (defines the IDs)")
+    parser.add_argument("--extra", default=file2_path, help="Record file whose fields are merged in")
+    parser.add_argument("--vectors", default=vectors_path, help="Vector store whose rows become each record's 'vector' (skipped if missing)")
+    parser.add_argument("-o", "--output", default=output_path, help="Merged NDJSON output")
+    parser.add_argument("--client-output", default=client_output_path, help="Merged records as one JSON object")
+    args = parser.parse_args(argv)
+    merge(args.base, args.extra, args.output, args.client_output, args.vectors)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,41 +11,50 @@ Behavior:
          BUT keep it if there is meaningful token overlap (to avoid false deletions)
   3) After duplicate-based deletions, perform the author-correction link fixes
      (look for "This corrects the article" and replace link with href inside box).
-  4) Report everything in change_report.json.
-  5) Default is dry-run (use --dry-run to inspect; omit to write output CSV).
+  4) Report rows whose titles are near-duplicates under different PMCIDs
+     (MinHash/LSH candidates, confirmed with the same title similarity check).
+  5) Report everything in change_report.json; run metrics (rows, deletions, rewrites,
+     parse time, HTTP requests/latency) go to metrics/fix.json and metrics/fix.prom.
+  6) Default is dry-run (use --dry-run to inspect; omit to write output CSV).
 
 Usage:
   python util.py -i SB_publication_PMC.csv -o SB_publication_PMC_fixed.csv --dry-run
   python util.py -i SB_publication_PMC.csv -o SB_publication_PMC_fixed.csv --title-threshold 0.9
+  python util.py -i SB_publication_PMC.csv -o SB_publication_PMC_fixed.csv --workers 8
 """
 
 import argparse
 import json
 import os
 import re
+import threading
 import time
+from collections import Counter
 from urllib.parse import urlparse
 from typing import Set
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from tqdm import tqdm
 from difflib import SequenceMatcher
 
+import metrics
+from pipeline import ordered_map
+from pmc_xml import split_articleset
+from http_cache import cached_get, cached_stream
+# HTML/XML extraction (lxml fast path with BeautifulSoup fallback, see parsers.py)
+from parsers import (TARGET_PHRASE, Document, extract_title_from_html, extract_title_from_pmc_xml,
+                     find_correction_href, normalize_url_no_fragment)
+
 # config
 USER_AGENT = "Mozilla/5.0 (compatible; PMC-Link-Fixer/1.4)"
 REQUEST_TIMEOUT = 20
 SLEEP_BETWEEN = 0.34
 REPORT_FILENAME = "change_report.json"
-TARGET_PHRASE = "This corrects the article"
-PMC_BASE = "https://pmc.ncbi.nlm.nih.gov"
 
 PMCID_RE = re.compile(r"(PMC\d+)", re.I)
 PMC_LINK_RE = re.compile(r"/pmc/articles/(PMC\d+)", re.I)
 
 EFETCH = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 NCBI_API_KEY = os.getenv("NCBI_API_KEY", None)
+EFETCH_BATCH_SIZE = 150
 
 
 
@@ -60,7 +69,7 @@ def is_http_url(s: str) -> bool:
 def fetch_html(url: str):
     headers = {"User-Agent": USER_AGENT}
     try:
-        r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        r = cached_get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         r.raise_for_status()
         return r.text, r.status_code
     except Exception as e:
@@ -72,52 +81,29 @@ def efetch_pmc_xml(pmcid: str):
     if NCBI_API_KEY:
         params["api_key"] = NCBI_API_KEY
     try:
-        r = requests.get(EFETCH, params=params, headers={"User-Agent": USER_AGENT}, timeout=30)
+        r = cached_get(EFETCH, params=params, headers={"User-Agent": USER_AGENT}, timeout=30)
         r.raise_for_status()
         return r.text
     except Exception:
         return None
 
 
-
-def extract_title_from_pmc_xml(xml_text: str):
-    try:
-        soup = BeautifulSoup(xml_text, "lxml-xml")
-        ttag = soup.find("article-title")
-        if ttag:
-            return " ".join(ttag.stripped_strings).strip()
-    except Exception:
-        pass
-    return None
-
-
-def extract_title_from_html(html: str):
-    soup = BeautifulSoup(html, "lxml")
-    meta_keys = [
-        ('meta', {'name': 'dc.Title'}),
-        ('meta', {'name': 'DC.title'}),
-        ('meta', {'name': 'citation_title'}),
-        ('meta', {'property': 'og:title'}),
-        ('meta', {'name': 'title'}),
-    ]
-    for tag_name, attrs in meta_keys:
+def efetch_pmc_xml_batch(pmcids):
+    """
+    Yield (pmcid, article_xml) for many PMCIDs using EFETCH_BATCH_SIZE ids per efetch
+    request. Each <article> is yielded as it streams in; failed batches are skipped.
+    """
+    pmcids = list(pmcids)
+    for i in range(0, len(pmcids), EFETCH_BATCH_SIZE):
+        params = {"db": "pmc", "id": ",".join(pmcids[i:i + EFETCH_BATCH_SIZE]), "retmode": "xml"}
+        if NCBI_API_KEY:
+            params["api_key"] = NCBI_API_KEY
         try:
-            tag = soup.find(tag_name, attrs=attrs)
-            if tag:
-                content = tag.get("content") or tag.string
-                if content:
-                    return content.strip()
+            with cached_stream("POST", EFETCH, params=params, headers={"User-Agent": USER_AGENT}, timeout=120) as body:
+                yield from split_articleset(body)
         except Exception:
-            pass
-    t = soup.find("title")
-    if t and t.string:
-        return t.string.strip()
-    h1 = soup.find("h1")
-    if h1:
-        txt = " ".join(h1.stripped_strings)
-        if txt:
-            return txt.strip()
-    return None
+            continue
+
 
 
 def page_contains_correction_phrase(html: str):
@@ -138,23 +124,99 @@ def extract_pmcid_from_url(url: str):
     return None
 
 
-def fetch_title_for_url(url: str):
+class PageMemo:
+    """
+    Everything one fix_corrections run fetches. Each URL's HTML and each PMCID's efetch
+    XML is fetched once, and each page is parsed once (parsers.Document) and shared by
+    the correction-phrase check, the title check and find_correction_href.
+    A failed fetch is not remembered, so a later row asking for the same page tries
+    again. fetches counts the network requests made.
+    efetch_xml is an optional {PMCID: article_xml} prefetched with efetch_pmc_xml_batch.
+    """
+
+    def __init__(self, efetch_xml: dict = None):
+        self.efetch_xml = dict(efetch_xml or {})
+        self.fetches = 0
+        self._pages = {}
+        self._xml_titles = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _once(self, table: dict, key, compute, keep):
+        # safe under worker threads: concurrent callers for one key wait for a single compute()
+        # (only values that pass keep() are stored; a failure is computed again next time)
+        with self._lock:
+            if key in table:
+                return table[key]
+            key_lock = self._key_locks.setdefault((id(table), key), threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in table:
+                    return table[key]
+            value = compute()
+            with self._lock:
+                if keep(value):
+                    table[key] = value
+                self._key_locks.pop((id(table), key), None)
+            return value
+
+    def _fetched(self):
+        with self._lock:
+            self.fetches += 1
+
+    def _fetch_page(self, url):
+        self._fetched()
+        html, status = fetch_html(url)
+        return Document(html) if html is not None else None, status
+
+    def _fetch_efetch_title(self, pmcid):
+        xml = self.efetch_xml.get(pmcid)
+        if xml is None:
+            self._fetched()
+            xml = efetch_pmc_xml(pmcid)
+        if not xml:
+            return None, xml
+        with metrics.timer("parse"):
+            return extract_title_from_pmc_xml(xml), xml
+
+    def page(self, url: str):
+        """(Document or None, status) for url."""
+        return self._once(self._pages, url, lambda: self._fetch_page(url), keep=lambda value: value[0] is not None)
+
+    def efetch_title(self, pmcid: str):
+        """(title or None, article_xml or None) for a PMCID."""
+        return self._once(self._xml_titles, pmcid, lambda: self._fetch_efetch_title(pmcid), keep=lambda value: bool(value[1]))
+
+    def forget(self, url: str):
+        """Drop a page (and its parsed tree) that no later row needs."""
+        with self._lock:
+            self._pages.pop(url, None)
+
+    def keep_only(self, urls):
+        with self._lock:
+            for url in [u for u in self._pages if u not in urls]:
+                del self._pages[url]
+
+
+def fetch_title_for_url(url: str, pages: PageMemo = None):
     """
     Return (title_or_None, html_text_or_None).
     Prefer efetch XML when PMCID present; fallback to fetching page HTML.
+    pages shares fetches and parses with the rest of the run (a fresh memo if omitted).
     """
+    if pages is None:
+        pages = PageMemo()
     pmc = extract_pmcid_from_url(url)
     if pmc:
-        xml = efetch_pmc_xml(pmc)
-        if xml:
-            title = extract_title_from_pmc_xml(xml)
-            if title:
-                return title, xml
+        title, xml = pages.efetch_title(pmc)
+        if title:
+            return title, xml
     # fallback to fetching page HTML
-    html, status = fetch_html(url)
-    if html:
-        title = extract_title_from_html(html)
-        return title, html
+    doc, status = pages.page(url)
+    if doc is not None and doc.markup:
+        with metrics.timer("parse"):
+            title = extract_title_from_html(doc)
+        return title, doc.markup
     return None, None
 
 
@@ -166,15 +228,18 @@ def normalize_title(t: str):
     return t2
 
 
-def titles_similar(a: str, b: str, threshold=0.90):
+def title_similarity(a: str, b: str):
     if not a or not b:
-        return False
+        return 0.0
     a_n = normalize_title(a)
     b_n = normalize_title(b)
     if not a_n or not b_n:
-        return False
-    ratio = SequenceMatcher(None, a_n, b_n).ratio()
-    return ratio >= float(threshold)
+        return 0.0
+    return SequenceMatcher(None, a_n, b_n).ratio()
+
+
+def titles_similar(a: str, b: str, threshold=0.90):
+    return title_similarity(a, b) >= float(threshold)
 
 
 
@@ -219,72 +284,60 @@ def token_overlap_info(a: str, b: str):
 
 
 
-def normalize_url_no_fragment(u: str):
-    if not u:
-        return ""
-    p = urlparse(u)
-    path = (p.path or "").rstrip("/")
-    return f"{p.scheme}://{p.netloc}{path}".lower()
-
-
-def resolve_pmc_href(href: str):
-    if not href:
-        return None
-    href = href.strip()
-    if href.startswith("/"):
-        return PMC_BASE + href
-    return href
-
+def find_near_duplicate_titles(df, url_col, title_col, threshold=0.90):
+    """
+    Rows whose titles are near-duplicates although their links carry different (or no)
+    PMCIDs - corrections, preprints and re-uploads that exact PMCID grouping misses.
+    MinHash/LSH over tokenize_for_overlap tokens picks the candidate pairs (see
+    dedupe.py); only those get the exact titles_similar check.
+    """
+    from dedupe import near_duplicates
+
+    titles = [(idx, t) for idx, t in df[title_col].items() if isinstance(t, str) and t.strip()]
+    pairs = near_duplicates(titles, tokenize=tokenize_for_overlap,
+                            is_match=lambda a, b: titles_similar(a, b, threshold=threshold))
+    found = []
+    for idx_a, idx_b, jaccard in pairs:
+        url_a, url_b = df.at[idx_a, url_col], df.at[idx_b, url_col]
+        pmc_a, pmc_b = extract_pmcid_from_url(url_a), extract_pmcid_from_url(url_b)
+        if pmc_a and pmc_a == pmc_b:
+            # same PMCID: that is an exact duplicate group, handled by the title check
+            continue
+        found.append({
+            "row_index": int(idx_a),
+            "duplicate_row_index": int(idx_b),
+            "url": url_a,
+            "duplicate_url": url_b,
+            "pmcid": pmc_a,
+            "duplicate_pmcid": pmc_b,
+            "title": df.at[idx_a, title_col],
+            "duplicate_title": df.at[idx_b, title_col],
+            "similarity": title_similarity(df.at[idx_a, title_col], df.at[idx_b, title_col]),
+            "estimated_token_jaccard": jaccard,
+            "action": "reported_near_duplicate_title"
+        })
+    return found
+
+
+@metrics.stage("fix")
+def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, title_threshold=0.90, workers=1):
+    """
+    workers > 1 fetches and parses rows on that many threads, paced by the shared per-host
+    rate limit in http_client instead of sleeping `delay` after every row that made a
+    request. Decisions are still taken one row at a time in CSV order, so
+    change_report.json, the deletions and the URL rewrites are the same as a serial run.
+    """
+    # heavy imports stay out of module load, so `--help` and the CLI start instantly
+    import pandas as pd
+    from tqdm import tqdm
 
-def find_correction_href(html: str, base_url: str = None):
-    if not html:
-        return None, "no_html", None
-    soup = BeautifulSoup(html, "lxml")
-    phrase_re = re.compile(re.escape(TARGET_PHRASE), re.I)
-    matched = [tag for tag in soup.find_all() if tag.get_text(" ", strip=True) and phrase_re.search(tag.get_text(" ", strip=True))]
-    if not matched:
-        return None, "phrase_not_found", None
-
-    page_norm = normalize_url_no_fragment(base_url) if base_url else ""
-
-    def candidates_from_element(el):
-        cand = []
-        for a in el.find_all("a", href=True):
-            href = a.get("href", "").strip()
-            if href.startswith("#"):
-                continue
-            resolved = resolve_pmc_href(href)
-            if not resolved:
-                continue
-            if page_norm and normalize_url_no_fragment(resolved) == page_norm:
-                continue
-            cand.append((resolved, a))
-        return cand
-
-    for el in matched:
-        cands = candidates_from_element(el)
-        if cands:
-            return cands[0][0], "first_candidate_inside", el.get_text(" ", strip=True)[:400]
-        sib = el.find_next_sibling()
-        steps = 0
-        while sib and steps < 6:
-            cands = candidates_from_element(sib)
-            if cands:
-                return cands[0][0], "first_candidate_in_sibling", (el.get_text(" ", strip=True) + " | " + sib.get_text(" ", strip=True))[:600]
-            sib = sib.find_next_sibling()
-            steps += 1
-        parent = el.parent
-        if parent:
-            cands = candidates_from_element(parent)
-            if cands:
-                return cands[0][0], "first_candidate_in_parent", parent.get_text(" ", strip=True)[:600]
-
-    return None, "phrase_found_no_valid_anchor", matched[0].get_text(" ", strip=True)[:400]
-
-
-
-def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, title_threshold=0.90):
     df = pd.read_csv(input_csv, dtype=str)
+    if workers > 1:
+        run = lambda fn, jobs: ordered_map(fn, jobs, workers)
+        pause = 0
+    else:
+        run = map
+        pause = delay
 
     # detect url and title columns
     url_col = None
@@ -314,10 +367,24 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
     pmc_counts = df["_PMCID"].value_counts()
     duplicated_pmcs = set(pmc_counts[pmc_counts > 1].index.tolist())
 
+    pages = PageMemo()
+    fetches_seen = 0
+
+    def pause_after_fetch():
+        # rows answered from the memo made no request, so there is nothing to wait out
+        nonlocal fetches_seen
+        if pages.fetches != fetches_seen:
+            time.sleep(pause)
+        fetches_seen = pages.fetches
+
     if duplicated_pmcs:
-        # iterate duplicate groups
-        for pmc in tqdm(sorted(duplicated_pmcs), desc="checking duplicate PMCID groups"):
-            group = df[df["_PMCID"] == pmc].copy()
+        # one batched efetch for every duplicated PMCID instead of one request per row
+        pages = PageMemo(efetch_pmc_xml_batch(sorted(duplicated_pmcs)))
+
+        # rows to check, in the order the serial scan visits them
+        dup_rows = []
+        for pmc in sorted(duplicated_pmcs):
+            group = df[df["_PMCID"] == pmc]
             # for each row in this duplicate group, fetch actual title and compare to CSV title
             for idx, row in group.iterrows():
                 csv_title = row[title_col] if title_col and isinstance(row[title_col], str) else ""
@@ -325,92 +392,105 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
                 if not csv_title or not url:
                     # skip if missing essential data
                     continue
+                dup_rows.append((pmc, idx, csv_title, url))
+
+        def check_duplicate_row(job):
+            url = job[3]
+            # fetch minimal html to check correction phrase first
+            doc, status = pages.page(url)
+            if doc is None or page_contains_correction_phrase(doc.markup):
+                return doc, status, doc is not None, None
+            # fetch the authoritative title (efetch if PMCID present)
+            fetched_title, _ = fetch_title_for_url(url, pages)
+            return doc, status, False, fetched_title
+
+        checked = zip(dup_rows, run(check_duplicate_row, dup_rows))
+        for (pmc, idx, csv_title, url), (doc, status, is_correction_page, fetched_title) in tqdm(
+                checked, total=len(dup_rows), desc="checking duplicate PMCID rows"):
+            metrics.count("duplicate_rows_checked")
+            if doc is None:
+                metrics.count("fetch_failures")
+                report["errors"].append({
+                    "row_index": int(idx),
+                    "original_url": url,
+                    "action": "fetch_failed_before_title_check",
+                    "status": status
+                })
+                pause_after_fetch()
+                continue
 
-                # fetch minimal html to check correction phrase first
-                html, status = fetch_html(url)
-                if html is None:
-                    report["errors"].append({
-                        "row_index": int(idx),
-                        "original_url": url,
-                        "action": "fetch_failed_before_title_check",
-                        "status": status
-                    })
-                    time.sleep(delay)
-                    continue
+            # skip title-check if this page is a correction page
+            if is_correction_page:
+                # record that we skipped this row for deletion
+                report.setdefault("skipped_title_check_due_to_correction", []).append({
+                    "row_index": int(idx),
+                    "original_url": url,
+                    "pmcid": pmc
+                })
+                pause_after_fetch()
+                continue
 
-                # skip title-check if this page is a correction page
-                if page_contains_correction_phrase(html):
-                    # record that we skipped this row for deletion
-                    report.setdefault("skipped_title_check_due_to_correction", []).append({
-                        "row_index": int(idx),
-                        "original_url": url,
-                        "pmcid": pmc
-                    })
-                    time.sleep(delay)
-                    continue
+            if not fetched_title:
+                report["errors"].append({
+                    "row_index": int(idx),
+                    "original_url": url,
+                    "action": "title_fetch_failed_for_duplicate_group",
+                })
+                pause_after_fetch()
+                continue
 
-                # fetch the authoritative title (efetch if PMCID present)
-                fetched_title, fetched_html = fetch_title_for_url(url)
-                if not fetched_title:
-                    report["errors"].append({
+            # original similarity test
+            similar = titles_similar(csv_title, fetched_title, threshold=title_threshold)
+
+            if not similar:
+                # token overlap guard to avoid deleting slightly-different-but-same titles
+                num_common, frac_a, frac_b = token_overlap_info(csv_title, fetched_title)
+
+                # tuning parameters (conservative defaults)
+                MIN_COMMON_TOKENS = 1
+                MIN_FRACTION = 0.20  # 20%
+
+                keep_due_to_token_match = (num_common >= MIN_COMMON_TOKENS) or (frac_a >= MIN_FRACTION) or (frac_b >= MIN_FRACTION)
+
+                if keep_due_to_token_match:
+                    # record that we decided to keep this row because token overlap suggests it's the same paper
+                    report["duplicate_title_ok_token_match"].append({
                         "row_index": int(idx),
                         "original_url": url,
-                        "action": "title_fetch_failed_for_duplicate_group",
+                        "pmcid": pmc,
+                        "csv_title": csv_title,
+                        "fetched_title": fetched_title,
+                        "num_common_tokens": num_common,
+                        "frac_common_csv": frac_a,
+                        "frac_common_fetched": frac_b,
+                        "action": "kept_due_to_token_overlap"
                     })
-                    time.sleep(delay)
-                    continue
-
-                # original similarity test
-                similar = titles_similar(csv_title, fetched_title, threshold=title_threshold)
-
-                if not similar:
-                    # token overlap guard to avoid deleting slightly-different-but-same titles
-                    num_common, frac_a, frac_b = token_overlap_info(csv_title, fetched_title)
-
-                    # tuning parameters (conservative defaults)
-                    MIN_COMMON_TOKENS = 1
-                    MIN_FRACTION = 0.20  # 20%
-
-                    keep_due_to_token_match = (num_common >= MIN_COMMON_TOKENS) or (frac_a >= MIN_FRACTION) or (frac_b >= MIN_FRACTION)
-
-                    if keep_due_to_token_match:
-                        # record that we decided to keep this row because token overlap suggests it's the same paper
-                        report["duplicate_title_ok_token_match"].append({
-                            "row_index": int(idx),
-                            "original_url": url,
-                            "pmcid": pmc,
-                            "csv_title": csv_title,
-                            "fetched_title": fetched_title,
-                            "num_common_tokens": num_common,
-                            "frac_common_csv": frac_a,
-                            "frac_common_fetched": frac_b,
-                            "action": "kept_due_to_token_overlap"
-                        })
-                    else:
-                        # Delete this row (only within duplicated PMCID groups)
-                        report["duplicate_title_deletions"].append({
-                            "row_index": int(idx),
-                            "original_url": url,
-                            "pmcid": pmc,
-                            "csv_title": csv_title,
-                            "fetched_title": fetched_title,
-                            "similarity_threshold": float(title_threshold),
-                            "token_common": num_common,
-                            "frac_common_csv": frac_a,
-                            "frac_common_fetched": frac_b,
-                            "action": "deleted_title_mismatch_in_duplicate_group"
-                        })
-                        df.drop(index=idx, inplace=True)
                 else:
-                    # record match
-                    report.setdefault("duplicate_title_ok", []).append({
+                    # Delete this row (only within duplicated PMCID groups)
+                    report["duplicate_title_deletions"].append({
                         "row_index": int(idx),
                         "original_url": url,
                         "pmcid": pmc,
-                        "action": "title_matched"
+                        "csv_title": csv_title,
+                        "fetched_title": fetched_title,
+                        "similarity_threshold": float(title_threshold),
+                        "token_common": num_common,
+                        "frac_common_csv": frac_a,
+                        "frac_common_fetched": frac_b,
+                        "action": "deleted_title_mismatch_in_duplicate_group"
                     })
+                    df.drop(index=idx, inplace=True)
+                    metrics.count("deletions")
+            else:
+                # record match
+                report.setdefault("duplicate_title_ok", []).append({
+                    "row_index": int(idx),
+                    "original_url": url,
+                    "pmcid": pmc,
+                    "action": "title_matched"
+                })
 
-                time.sleep(delay)
+            pause_after_fetch()
     else:
         # no duplicate pmcids found
         report["note"] = "no_duplicate_pmcids_found"
@@ -419,25 +499,40 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
     df.drop(columns=["_PMCID"], inplace=True, errors="ignore")
     df = df.reset_index(drop=True)
 
+    # pages of deleted rows are not needed again; the rest are released after their last row
+    urls_left = Counter(u for u in df[url_col] if isinstance(u, str) and u.strip())
+    pages.keep_only(urls_left)
+
     # perform author-correction link fixes on remaining rows 
-    corr_changes = []
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="processing rows (corrections)"):
-        url = row[url_col]
-        if not isinstance(url, str) or not url.strip():
-            continue
+    corr_rows = [(idx, url) for idx, url in df[url_col].items() if isinstance(url, str) and url.strip()]
 
-        html, status = fetch_html(url)
-        if html is None:
+    def locate_correction(job):
+        idx, url = job
+        doc, status = pages.page(url)
+        if doc is None:
+            return status, None
+        with metrics.timer("parse"):
+            return status, find_correction_href(doc, base_url=url)
+
+    corr_changes = []
+    for (idx, url), (status, located) in tqdm(zip(corr_rows, run(locate_correction, corr_rows)), total=len(corr_rows),
+                                              desc="processing rows (corrections)"):
+        urls_left[url] -= 1
+        if not urls_left[url]:
+            pages.forget(url)
+        metrics.count("items")
+        if located is None:
+            metrics.count("fetch_failures")
             corr_changes.append({
                 "row_index": int(idx),
                 "original_url": url,
                 "action": "fetch_failed",
                 "status": status
             })
-            time.sleep(delay)
+            pause_after_fetch()
             continue
 
-        found_href, reason, snippet = find_correction_href(html, base_url=url)
+        found_href, reason, snippet = located
         if found_href:
             if is_http_url(found_href) and normalize_url_no_fragment(found_href) != normalize_url_no_fragment(url):
                 corr_changes.append({
@@ -448,6 +543,7 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
                     "snippet": snippet
                 })
                 df.at[idx, url_col] = found_href
+                metrics.count("url_rewrites")
             else:
                 corr_changes.append({
                     "row_index": int(idx),
@@ -465,9 +561,16 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
                 "snippet": snippet
             })
 
-        time.sleep(delay)
+        pause_after_fetch()
 
     report["correction_changes"] = corr_changes
+
+    # near-duplicate titles across different PMCIDs (reported only; row indexes match the output CSV)
+    if title_col:
+        with metrics.timer("near_duplicate_scan"):
+            report["near_duplicate_titles"] = find_near_duplicate_titles(df, url_col, title_col, threshold=title_threshold)
+        metrics.count("near_duplicate_pairs", len(report["near_duplicate_titles"]))
+
     report["final_row_count"] = int(len(df))
 
     # write report
@@ -482,16 +585,18 @@ def fix_corrections(input_csv, output_csv, dry_run=True, delay=SLEEP_BETWEEN, ti
 
 
 
-def main_cli():
+def main_cli(argv=None):
     parser = argparse.ArgumentParser(description='Fix author-correction links and (only for duplicated PMCID groups) delete rows whose CSV title differs from the linked paper title.')
     parser.add_argument("-i", "--input", required=True, help="Input CSV path")
     parser.add_argument("-o", "--output", required=False, default="fixed_output.csv", help="Output CSV path")
     parser.add_argument("--dry-run", action="store_true", help="Produce report only; do not write output CSV")
     parser.add_argument("--delay", type=float, default=SLEEP_BETWEEN, help="Seconds to sleep between requests")
+    parser.add_argument("--workers", type=int, default=1, help="Fetch and parse rows on this many threads (rate limited per host instead of --delay); same report as a serial run")
     parser.add_argument("--title-threshold", type=float, default=0.90, help="Similarity threshold (0-1) to accept CSV title vs fetched title inside duplicate groups")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    report = fix_corrections(args.input, args.output, dry_run=args.dry_run, delay=args.delay, title_threshold=args.title_threshold)
+    report = fix_corrections(args.input, args.output, dry_run=args.dry_run, delay=args.delay, title_threshold=args.title_threshold,
+                             workers=args.workers)
 
     # print short summary
     summary = {
@@ -502,6 +607,7 @@ def main_cli():
         "duplicate_title_deletions": len(report.get("duplicate_title_deletions", [])),
         "duplicate_title_ok_token_match": len(report.get("duplicate_title_ok_token_match", [])),
         "correction_changes": len(report.get("correction_changes", [])),
+        "near_duplicate_titles": len(report.get("near_duplicate_titles", [])),
         "final_row_count": report.get("final_row_count")
     }
     print("Report summary:")
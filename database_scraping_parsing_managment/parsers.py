@@ -0,0 +1,468 @@
+"""
+parsers.py (parser backends for the hot HTML/XML extractors)
+
+The pipeline's extractors used to build BeautifulSoup trees for every page (some with
+the pure-python html.parser, some with lambda string= filters). Each extractor here
+has two implementations with the same output:
+
+  lxml   fast path: lxml.html / lxml.etree trees, XPath and plain element walks
+  bs4    the original BeautifulSoup code, kept as the reference and as the fallback
+
+PMC_PARSER=bs4 forces the reference path. With the default (lxml) an extractor only
+falls back to bs4 when lxml cannot take the input (undecodable bytes, documents lxml
+refuses to parse). benchmarks/bench_parsers.py checks both paths give identical
+output on the saved fixtures and times them.
+
+Extractors:
+  extract_title_from_pmc_xml(xml)          first <article-title> of efetch XML
+  extract_title_from_html(html)            citation/DC/og meta title, <title>, <h1>
+  find_correction_href(html, base_url)     link out of a "This corrects the article" notice
+  extract_sections(html)                   (page title, text handed to the summarizer)
+
+The HTML extractors take markup or a Document, which parses its page once for all of them.
+"""
+
+import bisect
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from pmc_xml import stripped_text, tag_string
+
+BACKEND = os.getenv("PMC_PARSER", "lxml").lower()
+
+TARGET_PHRASE = "This corrects the article"
+PMC_BASE = "https://pmc.ncbi.nlm.nih.gov"
+
+# headers whose sections are handed to the summarizer
+SECTION_KEYWORDS = ["abstract", "summary", "result", "conclu"]
+
+# text nodes bs4's get_text() leaves out (script/style/template/ruby strings; comments
+# are never text() nodes in XPath)
+_VISIBLE_STRINGS = etree.XPath(
+    "descendant::text()[not(parent::script or parent::style or parent::template or parent::rt or parent::rp)]"
+)
+_SECTION_PARAGRAPHS = etree.XPath("//section[@id = $sid]//p")
+_XML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, huge_tree=True)
+
+FALLBACK_ERRORS = (etree.LxmlError, ValueError, UnicodeDecodeError)
+
+
+class Document:
+    """
+    A fetched page, parsed at most once. Hand it to the extractors in place of the
+    markup when several of them read the same page; the lxml tree is built on first use
+    and shared. (The bs4 fallback still parses the markup itself.)
+    """
+
+    def __init__(self, markup):
+        self.markup = markup
+        self._root = None
+        self._lock = threading.Lock()
+
+    def root(self):
+        with self._lock:
+            if self._root is None:
+                self._root = parse_html(self.markup)
+            return self._root
+
+
+def markup_of(page):
+    return page.markup if isinstance(page, Document) else page
+
+
+def _dispatch(fast, reference, page, *args):
+    if BACKEND != "bs4":
+        try:
+            return fast(page, *args)
+        except FALLBACK_ERRORS:
+            pass
+    return reference(markup_of(page), *args)
+
+
+def _soup(markup, features):
+    # bs4 is only needed by the reference/fallback path, so it is imported on first use
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markup, features)
+
+
+# ---------- lxml helpers (bs4-compatible text semantics) ----------
+def parse_html(html):
+    """lxml.html document for str, bytes or a Document; raises if lxml cannot take it."""
+    if isinstance(html, Document):
+        return html.root()
+    if isinstance(html, bytes):
+        # strict utf-8; anything else is left to bs4's encoding detection
+        html = html.decode("utf-8")
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input carrying an XML encoding declaration
+        return lxml_html.document_fromstring(html.encode("utf-8"))
+
+
+def get_text(el, separator: str = "", strip: bool = False) -> str:
+    """Same as bs4's Tag.get_text(separator, strip=strip) for an lxml.html element."""
+    strings = _VISIBLE_STRINGS(el)
+    if strip:
+        strings = [s.strip() for s in strings]
+        strings = [s for s in strings if s]
+    return separator.join(strings)
+
+
+def normalize_url_no_fragment(u: str):
+    if not u:
+        return ""
+    p = urlparse(u)
+    path = (p.path or "").rstrip("/")
+    return f"{p.scheme}://{p.netloc}{path}".lower()
+
+
+def resolve_pmc_href(href: str):
+    if not href:
+        return None
+    href = href.strip()
+    if href.startswith("/"):
+        return PMC_BASE + href
+    return href
+
+
+def _usable_href(href, page_norm):
+    """resolved href if it can be a correction target, else None."""
+    href = (href or "").strip()
+    if href.startswith("#"):
+        return None
+    resolved = resolve_pmc_href(href)
+    if not resolved:
+        return None
+    if page_norm and normalize_url_no_fragment(resolved) == page_norm:
+        return None
+    return resolved
+
+
+# ---------- efetch XML title ----------
+def _title_from_pmc_xml_lxml(xml_text):
+    data = xml_text.encode("utf-8") if isinstance(xml_text, str) else xml_text
+    root = etree.fromstring(data, _XML_PARSER)
+    if root is None:
+        return None
+    ttag = next(root.iter("article-title"), None)
+    if ttag is not None:
+        return stripped_text(ttag).strip()
+    return None
+
+
+def _title_from_pmc_xml_bs4(xml_text):
+    try:
+        soup = _soup(xml_text, "lxml-xml")
+        ttag = soup.find("article-title")
+        if ttag:
+            return " ".join(ttag.stripped_strings).strip()
+    except Exception:
+        pass
+    return None
+
+
+def extract_title_from_pmc_xml(xml_text: str):
+    return _dispatch(_title_from_pmc_xml_lxml, _title_from_pmc_xml_bs4, xml_text)
+
+
+# ---------- HTML title ----------
+META_TITLE_KEYS = [
+    ('meta', {'name': 'dc.Title'}),
+    ('meta', {'name': 'DC.title'}),
+    ('meta', {'name': 'citation_title'}),
+    ('meta', {'property': 'og:title'}),
+    ('meta', {'name': 'title'}),
+]
+
+
+def _title_from_html_lxml(html):
+    root = parse_html(html)
+    for tag_name, attrs in META_TITLE_KEYS:
+        (attr, value), = attrs.items()
+        # first matching tag only, like soup.find()
+        tag = next((t for t in root.iter(tag_name) if t.get(attr) == value), None)
+        if tag is not None:
+            content = tag.get("content") or tag_string(tag)
+            if content:
+                return content.strip()
+    t = next(root.iter("title"), None)
+    if t is not None:
+        s = tag_string(t)
+        if s:
+            return s.strip()
+    h1 = next(root.iter("h1"), None)
+    if h1 is not None:
+        txt = get_text(h1, " ", strip=True)
+        if txt:
+            return txt.strip()
+    return None
+
+
+def _title_from_html_bs4(html):
+    soup = _soup(html, "lxml")
+    for tag_name, attrs in META_TITLE_KEYS:
+        try:
+            tag = soup.find(tag_name, attrs=attrs)
+            if tag:
+                content = tag.get("content") or tag.string
+                if content:
+                    return content.strip()
+        except Exception:
+            pass
+    t = soup.find("title")
+    if t and t.string:
+        return t.string.strip()
+    h1 = soup.find("h1")
+    if h1:
+        txt = " ".join(h1.stripped_strings)
+        if txt:
+            return txt.strip()
+    return None
+
+
+def extract_title_from_html(html: str):
+    return _dispatch(_title_from_html_lxml, _title_from_html_bs4, html)
+
+
+# ---------- correction notice link ----------
+# The notice is located in one pass over the page's visible text nodes: their stripped
+# text is joined with spaces (what get_text(" ", strip=True) gives for the whole page),
+# the phrase is searched once, and the text nodes it covers lead to the smallest
+# element enclosing it. Candidate links are then looked for inside that element, in
+# its next few siblings, and in its parent. (The old scan called get_text() on every
+# tag, re-serializing each ancestor's subtree, and since <html> always matched first it
+# returned the first link on the page.)
+SIBLING_STEPS = 6
+
+
+def _smallest_enclosing(strings, phrase_re, ancestors):
+    """
+    Yield (element, text) for each phrase occurrence. strings is [(text, parent
+    element)] for the page's visible text nodes in document order; ancestors(el)
+    yields el and then its ancestors.
+    """
+    pieces, owners, starts = [], [], []
+    pos = 0
+    for text, owner in strings:
+        text = text.strip()
+        if text:
+            pieces.append(text)
+            owners.append(owner)
+            starts.append(pos)
+            pos += len(text) + 1
+    joined = " ".join(pieces)
+    for m in phrase_re.finditer(joined):
+        first = bisect.bisect_right(starts, m.start()) - 1
+        last = bisect.bisect_right(starts, m.end() - 1) - 1
+        el = owners[first]
+        if last != first:
+            enclosing = set(ancestors(owners[last]))
+            el = next(a for a in ancestors(el) if a in enclosing)
+        yield el, m
+
+
+def _first_usable(anchors, page_norm):
+    for a in anchors:
+        if a.get("href") is not None:
+            resolved = _usable_href(a.get("href"), page_norm)
+            if resolved:
+                return resolved
+    return None
+
+
+def _lxml_text_owner(s):
+    # lxml hands back a tail string with the element it follows, not its DOM parent
+    return s.getparent().getparent() if s.is_tail else s.getparent()
+
+
+def _lxml_ancestors(el):
+    yield el
+    yield from el.iterancestors()
+
+
+def _next_tag(el):
+    # find_next_sibling() skips comments and processing instructions
+    sib = el.getnext()
+    while sib is not None and not isinstance(sib.tag, str):
+        sib = sib.getnext()
+    return sib
+
+
+def _find_correction_href_lxml(html, base_url=None):
+    root = parse_html(html)
+    phrase_re = re.compile(re.escape(TARGET_PHRASE), re.I)
+    page_norm = normalize_url_no_fragment(base_url) if base_url else ""
+
+    strings = ((s, _lxml_text_owner(s)) for s in _VISIBLE_STRINGS(root))
+    first_text = None
+    for el, _ in _smallest_enclosing(strings, phrase_re, _lxml_ancestors):
+        el_text = get_text(el, " ", strip=True)
+        first_text = first_text if first_text is not None else el_text
+        resolved = _first_usable(el.iter("a"), page_norm)
+        if resolved:
+            return resolved, "first_candidate_inside", el_text[:400]
+        sib = _next_tag(el)
+        steps = 0
+        while sib is not None and steps < SIBLING_STEPS:
+            resolved = _first_usable(sib.iter("a"), page_norm)
+            if resolved:
+                return resolved, "first_candidate_in_sibling", (el_text + " | " + get_text(sib, " ", strip=True))[:600]
+            sib = _next_tag(sib)
+            steps += 1
+        parent = el.getparent()
+        if parent is not None:
+            resolved = _first_usable(parent.iter("a"), page_norm)
+            if resolved:
+                return resolved, "first_candidate_in_parent", get_text(parent, " ", strip=True)[:600]
+
+    if first_text is None:
+        return None, "phrase_not_found", None
+    return None, "phrase_found_no_valid_anchor", first_text[:400]
+
+
+def _bs4_ancestors(el):
+    yield el
+    yield from el.parents
+
+
+def _find_correction_href_bs4(html, base_url=None):
+    soup = _soup(html, "lxml")
+    phrase_re = re.compile(re.escape(TARGET_PHRASE), re.I)
+    page_norm = normalize_url_no_fragment(base_url) if base_url else ""
+
+    strings = ((s, s.parent) for s in soup.strings)
+    first_text = None
+    for el, _ in _smallest_enclosing(strings, phrase_re, _bs4_ancestors):
+        el_text = el.get_text(" ", strip=True)
+        first_text = first_text if first_text is not None else el_text
+        resolved = _first_usable(el.find_all("a", href=True), page_norm)
+        if resolved:
+            return resolved, "first_candidate_inside", el_text[:400]
+        sib = el.find_next_sibling()
+        steps = 0
+        while sib and steps < SIBLING_STEPS:
+            resolved = _first_usable(sib.find_all("a", href=True), page_norm)
+            if resolved:
+                return resolved, "first_candidate_in_sibling", (el_text + " | " + sib.get_text(" ", strip=True))[:600]
+            sib = sib.find_next_sibling()
+            steps += 1
+        parent = el.parent
+        if parent:
+            resolved = _first_usable(parent.find_all("a", href=True), page_norm)
+            if resolved:
+                return resolved, "first_candidate_in_parent", parent.get_text(" ", strip=True)[:600]
+
+    if first_text is None:
+        return None, "phrase_not_found", None
+    return None, "phrase_found_no_valid_anchor", first_text[:400]
+
+
+def find_correction_href(html: str, base_url: str = None):
+    """(href, reason, snippet) for the article a correction notice points at."""
+    if not markup_of(html):
+        return None, "no_html", None
+    return _dispatch(_find_correction_href_lxml, _find_correction_href_bs4, html, base_url)
+
+
+# ---------- summarizer input ----------
+def _pick_sections(header_id_map):
+    # to avoid overloading tokens, if the paper has two of the below sections, then it only gives one
+    #   to the ai
+    if "abstract" in header_id_map.keys() and "summary" in header_id_map.keys():
+        del header_id_map["summary"]
+    if "result" in header_id_map.keys() and "conclu" in header_id_map.keys():
+        del header_id_map["conclu"]
+    return header_id_map
+
+
+def _is_keyword_header(text):
+    return text and any(key in text.lower() for key in SECTION_KEYWORDS)
+
+
+def _extract_sections_lxml(content):
+    root = parse_html(content)
+
+    title_tag = next(root.iter("title"), None)
+    title = get_text(title_tag, strip=True) if title_tag is not None else None
+    api_string = "Title: " + title + "\n" if title_tag is not None else "Title:\n"
+
+    # find headers for the key words (h2s first, then h3s, like the bs4 version)
+    valid_headers = [h for name in ("h2", "h3") for h in root.iter(name) if _is_keyword_header(tag_string(h))]
+
+    if valid_headers:
+        header_id_map = {}
+        for header_tag in valid_headers:
+            parent_section = next(header_tag.iterancestors("section"), None)
+            if parent_section is not None and parent_section.get("id"):
+                header_id_map[tag_string(header_tag).strip()] = parent_section.get("id")
+
+        for header_text, header_id in _pick_sections(header_id_map).items():
+            api_string += f"\n{header_text} Section:\n"
+            for p in _SECTION_PARAGRAPHS(root, sid=header_id):
+                api_string += get_text(p, strip=True)
+    else:
+        # if there are no sections then get the 10th-25th paragraphs to get a rough selection of the paper
+        for i, para in enumerate(root.iter("p")):
+            if i > 10 and i < 25:
+                api_string = api_string + "\n" + get_text(para).strip()
+            elif i >= 25:
+                break
+
+    return title, api_string
+
+
+def _extract_sections_bs4(content):
+    # create a BeautifulSoup object to parse the HTML
+    soup = _soup(content, 'html.parser')
+
+    # find headers for the key words
+    all_matching_headers = soup.find_all('h2', string=_is_keyword_header)
+    all_matching_headers3 = soup.find_all('h3', string=_is_keyword_header)
+    valid_headers = all_matching_headers + all_matching_headers3
+
+    title_tag = soup.select_one('title')
+    title = title_tag.get_text(strip=True) if title_tag else None
+    api_string = "Title: " + str(title) + "\n" if title_tag else "Title:\n"
+
+    if len(valid_headers) > 0:
+        header_id_map = {}
+        for header_tag in valid_headers:
+            parent_section = header_tag.find_parent('section')
+            if parent_section and parent_section.get('id'):
+                # header text is what definitively contains the keywords at this point
+                header_id_map[header_tag.string.strip()] = parent_section.get('id')
+
+        for header_text, header_id in _pick_sections(header_id_map).items():
+            # some sites have periods which cannot be properly parsed as is
+            if '.' in header_id:
+                header_id = header_id.replace('.', '\\.')
+
+            # get the paragraphs just from the sections with the ids corresponding to the proper label
+            #   and concatenate these into appropriate sections
+            paragraphs = soup.select(f'section#{header_id} p')
+            api_string += f"\n{header_text} Section:\n"
+            for p in paragraphs:
+                api_string += p.get_text(strip=True)
+    else:
+        # if there are no sections then get the 10th-25th paragraphs to get a rough selection of the paper
+        possible_paragraphs = soup.select("p")
+        for i, para in enumerate(possible_paragraphs):
+            if i > 10 and i < 25:
+                api_string = api_string + "\n" + para.get_text().strip()
+
+    return title, api_string
+
+
+def extract_sections(content):
+    """
+    (page title or None, summarizer input) for an article page: the title plus the
+    paragraphs of its abstract/summary/results/conclusion sections, or paragraphs
+    11-24 when the page has no such sections.
+    """
+    return _dispatch(_extract_sections_lxml, _extract_sections_bs4, content)
@@ -0,0 +1,208 @@
+"""
+pipeline.py (overlap network waits with CPU-bound parsing)
+
+  fetch stage   io_workers threads call fetch(job) and push each (key, payload) it
+                yields onto a bounded queue - blocking when parsing falls behind
+  parse stage   a ProcessPoolExecutor runs parse(payload) on every core; at most
+                queue_size parses are in flight at once
+  write stage   the calling thread hands each (key, result) to write() as it finishes,
+                so output files only ever have a single writer
+
+Network time and parse time then overlap instead of adding up, and memory stays
+bounded by the two queue sizes no matter how many jobs there are.
+
+parse must be a picklable top-level function (it runs in another process).
+
+ordered_map() is the lighter tool for loops whose decisions must stay in input order:
+the per-item work runs on threads, a bounded distance ahead of the consumer.
+
+Batcher turns a stream of items into batches for APIs that take many at once (the
+embedding endpoint): a background thread collects up to max_size items, hands them to
+flush() in arrival order, and flushes a partial batch when nothing new has arrived
+for idle_timeout seconds, and again on close(), so no item is ever left behind.
+
+Usage:
+  run_pipeline(batches, fetch=fetch_batch_xml, parse=metadata_from_xml, write=save)
+  for row, page in zip(rows, ordered_map(fetch_page, rows, workers=8)): ...
+  with Batcher(embed_and_write, max_size=100, idle_timeout=20) as batcher:
+      batcher.put((pmcid, summary))
+"""
+
+import collections
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+IO_WORKERS = 8
+QUEUE_SIZE = 64
+
+_JOB_DONE = object()
+_CLOSE = object()
+
+
+def run_pipeline(jobs, fetch, parse, write, io_workers: int = IO_WORKERS, parse_workers: int = None,
+                 queue_size: int = QUEUE_SIZE):
+    """
+    Run fetch -> parse -> write over `jobs`. fetch(job) yields (key, payload) pairs
+    and runs in a thread; parse(payload) runs in a worker process; write(key, result)
+    runs in the calling thread. Returns the number of items written. An exception
+    from parse or write stops the pipeline at once; one from fetch is re-raised after
+    the other jobs have drained.
+    """
+    jobs = list(jobs)
+    fetched = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # bounded put that still notices when the pipeline is shutting down
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch_job(job):
+        try:
+            for item in fetch(job):
+                if not put(item):
+                    return
+        finally:
+            put(_JOB_DONE)
+
+    written = 0
+    pending = {}  # parse future -> key
+    jobs_left = len(jobs)
+    io_pool = ThreadPoolExecutor(max_workers=io_workers)
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count())
+
+    def drain(block: bool):
+        nonlocal written
+        if not pending:
+            return
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for fut in done:
+            write(pending.pop(fut), fut.result())
+            written += 1
+
+    try:
+        fetch_futures = [io_pool.submit(fetch_job, job) for job in jobs]
+        while jobs_left or pending:
+            if not jobs_left or len(pending) >= queue_size:
+                drain(block=True)
+                continue
+            try:
+                item = fetched.get(timeout=0.05)
+            except queue.Empty:
+                drain(block=False)
+                continue
+            if item is _JOB_DONE:
+                jobs_left -= 1
+                continue
+            key, payload = item
+            pending[parse_pool.submit(parse, payload)] = key
+            drain(block=False)
+        for fut in fetch_futures:
+            fut.result()
+    except BaseException:
+        stop.set()
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        parse_pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    # every job has finished; let the worker processes exit cleanly
+    io_pool.shutdown(wait=True)
+    parse_pool.shutdown(wait=True)
+    return written
+
+
+def ordered_map(fn, items, workers: int = IO_WORKERS, window: int = None):
+    """
+    map(fn, items) with fn running on `workers` threads. Results are yielded in input
+    order, and at most `window` calls (default 4 * workers) run ahead of the consumer.
+    """
+    window = window or 4 * workers
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+
+class Batcher:
+    """
+    Collect put() items into batches of at most max_size and pass each to flush(batch)
+    on a background thread. A partial batch is flushed after idle_timeout seconds
+    without a new item, and whatever is left on close(). put() blocks once queue_size
+    items are waiting, and re-raises an exception from flush(); so does close().
+    """
+
+    def __init__(self, flush, max_size: int, idle_timeout: float = None, queue_size: int = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.flush = flush
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.flushed = 0
+        self._queue = queue.Queue(maxsize=queue_size or 2 * max_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout if batch else None)
+            except queue.Empty:
+                item = None
+            closing = item is _CLOSE
+            if item is not None and not closing:
+                batch.append(item)
+            if batch and (closing or item is None or len(batch) >= self.max_size):
+                try:
+                    self.flush(batch)
+                    self.flushed += len(batch)
+                except BaseException as exc:
+                    self._error = exc
+                    # keep draining so a blocked put() can notice the error
+                    while self._queue.get() is not _CLOSE:
+                        pass
+                    return
+                batch = []
+            if closing:
+                return
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, item):
+        self._check()
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                self._check()
+
+    def close(self):
+        """Flush what is left and wait for the background thread."""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,223 @@
+"""
+pmc_xml.py (streaming helpers for PMC efetch XML)
+
+efetch accepts a comma-separated id list and answers with one <pmc-articleset>
+holding an <article> per paper. split_articleset() walks that response with lxml
+iterparse and yields each article as soon as its closing tag arrives, clearing
+finished elements so memory stays at roughly one article regardless of batch size.
+
+iter_article_metadata() goes one step further: a single iterparse pass that pulls
+title, authors, journal, year and reference PMCIDs out of each article while it
+streams, clearing <ref> and <sec> subtrees as soon as they have been read. It gives
+the same answers as the BeautifulSoup extractors in scraper/newest_scraper.py
+(parse_metadata_from_xml + extract_pmcids_from_ref_node) without building a tree.
+
+Usage:
+  r = requests.post(EFETCH, data=params, stream=True)
+  r.raw.decode_content = True
+  for pmcid, article_xml in split_articleset(r.raw):
+      ...
+  for pmcid, meta in iter_article_metadata(r.raw):
+      meta["title"], meta["authors"], meta["year"], meta["journal"], meta["references"]
+"""
+
+import io
+import re
+
+from lxml import etree
+
+PMC_DIGITS_RE = re.compile(r"^(?:PMC)?(\d+)$", re.I)
+PMCID_RE = re.compile(r"(PMC\d+)", re.I)
+PMC_LINK_RE = re.compile(r"/pmc/articles/(PMC\d+)", re.I)
+YEAR_RE = re.compile(r"(19|20)\d{2}")
+HEADER_CHARS = 1000  # year fallback only looks at this much leading text
+
+# elements the single-pass extractor reacts to
+_METADATA_TAGS = ("article", "front", "article-title", "contrib", "journal-title", "pub-date", "ref", "sec")
+
+
+def article_pmcid(article):
+    """Return the normalized 'PMC123' id of an <article> element, or None."""
+    for aid in article.iter("article-id"):
+        if aid.get("pub-id-type") not in ("pmc", "pmcid"):
+            continue
+        m = PMC_DIGITS_RE.match((aid.text or "").strip())
+        if m:
+            return "PMC" + m.group(1)
+    return None
+
+
+def split_articleset(source):
+    """
+    Yield (pmcid, article_xml_text) for every <article> in an efetch response.
+    `source` is a file-like object (e.g. a streamed response's raw body) or a path.
+    """
+    context = etree.iterparse(source, events=("end",), tag="article", resolve_entities=False, huge_tree=True)
+    for _, article in context:
+        pmcid = article_pmcid(article)
+        xml_text = etree.tostring(article, encoding="unicode")
+        # free the finished article and anything before it before parsing the next one
+        article.clear()
+        parent = article.getparent()
+        if parent is not None:
+            while article.getprevious() is not None:
+                del parent[0]
+        yield pmcid, xml_text
+
+
+# ---------- single-pass metadata extraction ----------
+def stripped_text(el):
+    """Same as " ".join(bs4_tag.stripped_strings)."""
+    return " ".join(t.strip() for t in el.itertext() if t.strip())
+
+
+def tag_string(el):
+    """Mirror of bs4's Tag.string: the only text node under el, or None."""
+    nodes = [el.text] if el.text else []
+    for child in el:
+        nodes.append(child)
+        if child.tail:
+            nodes.append(child.tail)
+    if len(nodes) != 1:
+        return None
+    return nodes[0] if isinstance(nodes[0], str) else tag_string(nodes[0])
+
+
+def _header_text(article):
+    """First HEADER_CHARS of the article's stripped text (stops reading early)."""
+    parts, size = [], 0
+    for t in article.itertext():
+        t = t.strip()
+        if t:
+            parts.append(t)
+            size += len(t) + 1
+            if size > HEADER_CHARS:
+                break
+    return " ".join(parts)[:HEADER_CHARS]
+
+
+def ref_pmcids(ref):
+    """
+    PMCIDs cited by one <ref> element: from ext-link / a hrefs containing
+    '/pmc/articles/PMC\\d+', else any 'PMC\\d+' in the ref text. Unique, in order.
+    """
+    found = []
+    for tag in ref.iter("ext-link", "a"):
+        m = PMC_LINK_RE.search(tag.get("href") or "")
+        if m:
+            pmc = m.group(1).upper()
+            if pmc not in found:
+                found.append(pmc)
+    if not found:
+        for m in PMCID_RE.finditer(stripped_text(ref)):
+            pmc = m.group(1).upper()
+            if pmc not in found:
+                found.append(pmc)
+    return found
+
+
+def _author_name(contrib):
+    name_tag = next(contrib.iter("name"), None)
+    if name_tag is None:
+        return None
+    parts = []
+    for part_tag in ("surname", "given-names"):
+        tag = next(name_tag.iter(part_tag), None)
+        value = tag_string(tag) if tag is not None else None
+        if value:
+            parts.append(value.strip())
+    if parts:
+        return ", ".join(parts)
+    # fallback to any text
+    return stripped_text(contrib) or None
+
+
+class _ArticleState:
+    def __init__(self):
+        self.title = None
+        self.journal = None
+        self.authors = []
+        self.references = []
+        self.seen_pub_date = False
+        self.year = None
+        self.header = None
+        # subtrees may only be cleared once the year fallback can no longer need their text
+        self.settled = False
+
+    def metadata(self, article):
+        year = self.year
+        if not year:
+            header = self.header if self.header is not None else _header_text(article)
+            m = YEAR_RE.search(header)
+            if m:
+                year = m.group(0)
+        return {
+            "title": self.title,
+            "authors": self.authors,
+            "year": year,
+            "journal": self.journal,
+            "references": self.references,
+        }
+
+
+def iter_article_metadata(source):
+    """
+    Yield (pmcid, metadata) for every <article> in `source` (a path or file-like
+    object holding either a <pmc-articleset> or a single article) in one pass.
+    metadata has keys title, authors, year, journal and references.
+    """
+    state = _ArticleState()
+    context = etree.iterparse(source, events=("end",), tag=_METADATA_TAGS, resolve_entities=False, huge_tree=True)
+    for _, el in context:
+        tag = el.tag
+        if tag == "article-title":
+            if state.title is None:
+                state.title = stripped_text(el)
+        elif tag == "contrib":
+            if el.get("contrib-type") == "author":
+                name = _author_name(el)
+                if name:
+                    state.authors.append(name)
+        elif tag == "journal-title":
+            if state.journal is None:
+                state.journal = stripped_text(el)
+        elif tag == "pub-date":
+            # only the first pub-date counts, like soup.find("pub-date")
+            if not state.seen_pub_date:
+                state.seen_pub_date = True
+                y = next(el.iter("year"), None)
+                value = tag_string(y) if y is not None else None
+                if value:
+                    state.year = value.strip()
+                    state.settled = True
+        elif tag == "front":
+            if not state.settled:
+                parent = el.getparent()
+                if parent is not None and parent.tag == "article":
+                    state.header = _header_text(parent)
+                    state.settled = len(state.header) >= HEADER_CHARS
+        elif tag == "ref":
+            for pmc in ref_pmcids(el):
+                if pmc not in state.references:
+                    state.references.append(pmc)
+            if state.settled:
+                el.clear(keep_tail=True)
+        elif tag == "sec":
+            if state.settled:
+                el.clear(keep_tail=True)
+        elif tag == "article":
+            yield article_pmcid(el), state.metadata(el)
+            state = _ArticleState()
+            el.clear()
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+
+
+def parse_article_metadata(xml_text):
+    """Single-pass metadata for one efetch XML document; None if it holds no article."""
+    data = xml_text.encode("utf-8") if isinstance(xml_text, str) else xml_text
+    for _, meta in iter_article_metadata(io.BytesIO(data)):
+        return meta
+    return None
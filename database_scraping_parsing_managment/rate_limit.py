@@ -0,0 +1,163 @@
+"""
+rate_limit.py (thread-safe rate limiters shared by the scrapers and the LLM calls)
+
+NCBI E-utilities allow 3 requests/second without an API key and 10 requests/second
+with one. A token bucket lets many worker threads keep requests in flight while the
+aggregate start rate never goes above that quota.
+
+Gemini's quotas are per minute and count both requests (RPM) and tokens (TPM).
+QuotaLimiter keeps a sliding 60 s log of both, so worker threads run at whichever
+ceiling binds first, and backs off (and lowers its working quota) when the API
+answers 429 anyway, climbing back to the ceiling as calls succeed again.
+
+Usage:
+  limiter = TokenBucket(rate=ncbi_rate(api_key))
+  limiter.acquire()   # blocks until a request may start
+
+  quota = QuotaLimiter(rpm=15, tpm=250_000)
+  ticket = quota.acquire(estimated_tokens)   # blocks until the call fits in both quotas
+  ...call the API...
+  quota.settle(ticket, reported_tokens)      # or quota.throttled() on a 429, then retry
+"""
+
+import collections
+import random
+import threading
+import time
+
+NCBI_RATE_NO_KEY = 3.0
+NCBI_RATE_WITH_KEY = 10.0
+
+
+def ncbi_rate(api_key=None):
+    """Requests/second NCBI allows for this key (or lack of one)."""
+    return NCBI_RATE_WITH_KEY if api_key else NCBI_RATE_NO_KEY
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens are added per second up to `capacity`.
+    acquire() blocks until enough tokens are available, so callers on any thread
+    are spread out to at most `rate` starts per second (with bursts up to `capacity`).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        # default capacity of 1 means no bursts - safest for NCBI
+        self.capacity = float(capacity) if capacity else 1.0
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then consume them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Consume `tokens` if available right now; never blocks."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+
+class QuotaLimiter:
+    """
+    Requests/minute + tokens/minute limiter over a sliding window. acquire() reserves
+    one request of about `tokens`; settle() swaps that estimate for the real usage and
+    keeps a running ratio of real to estimated tokens, which later estimates are scaled
+    by (so a rough chars/4 guess does not leave the TPM quota half used).
+    throttled() (call it on a 429) pauses every caller with exponential backoff and
+    halves the working quotas (down to min_scale of the ceiling); each settled call
+    then raises them by `recovery` until they are back at the ceiling.
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, rpm: float, tpm: float = None, min_scale: float = 0.25, recovery: float = 0.05,
+                 backoff_base: float = 2.0, backoff_cap: float = 60.0):
+        if rpm <= 0:
+            raise ValueError("rpm must be positive")
+        self.rpm = float(rpm)
+        self.tpm = float(tpm) if tpm else None
+        self.min_scale = min_scale
+        self.recovery = recovery
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.scale = 1.0
+        self._log = collections.deque()   # one ticket per request in the window
+        self._tokens = 0.0
+        self._paused_until = 0.0
+        self._strikes = 0
+        self._ratio = None                # real / estimated tokens, once a call has settled
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._log and now - self._log[0][0] >= self.WINDOW:
+            self._tokens -= self._log.popleft()[1]
+
+    def _fits(self, tokens):
+        if len(self._log) + 1 > max(1.0, self.rpm * self.scale):
+            return False
+        # a single request bigger than the whole quota still goes out once the window is empty
+        return self.tpm is None or not self._log or self._tokens + tokens <= self.tpm * self.scale
+
+    def acquire(self, tokens: float = 0.0):
+        """Block until one more request of about `tokens` fits; returns its ticket for settle()."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._paused_until - now
+                expected = tokens * (self._ratio or 1.0)
+                if wait <= 0:
+                    if self._fits(expected):
+                        # [start time, tokens counted against the window, caller's estimate]
+                        ticket = [now, expected, float(tokens)]
+                        self._log.append(ticket)
+                        self._tokens += expected
+                        return ticket
+                    wait = self._log[0][0] + self.WINDOW - now
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def settle(self, ticket, tokens: float = None):
+        """Record a successful call, replacing its estimate with the usage the API reported."""
+        with self._lock:
+            if tokens is not None:
+                if any(t is ticket for t in self._log):
+                    self._tokens += tokens - ticket[1]
+                ticket[1] = float(tokens)
+                if ticket[2] > 0:
+                    ratio = tokens / ticket[2]
+                    self._ratio = ratio if self._ratio is None else 0.8 * self._ratio + 0.2 * ratio
+            self._strikes = 0
+            self.scale = min(1.0, self.scale + self.recovery)
+
+    def throttled(self, retry_after: float = None) -> float:
+        """Note a 429: pause everyone, lower the working quotas. Returns the pause in seconds."""
+        with self._lock:
+            self._strikes += 1
+            delay = retry_after
+            if delay is None:
+                delay = random.uniform(0.5, 1.0) * min(self.backoff_cap, self.backoff_base * 2 ** (self._strikes - 1))
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self.scale = max(self.min_scale, self.scale * 0.5)
+            return delay
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+reduce_dims.py (offline dimensionality reduction of the embedding store)
+
+gemini-embedding-001 vectors have 3072 dims, and every similarity search is a dot
+product over all of them. This step writes a narrower copy of a vector store:
+
+  truncate   keep the first --dim values and renormalize. gemini-embedding-001 is
+             trained Matryoshka-style (768 / 1536 / 3072 are the recommended widths),
+             so the leading dims carry most of the signal. Queries only need the same
+             slice (or embed_content's output_dimensionality).
+  pca        project onto the top --dim principal components of the corpus (mean
+             removed), fitted here. Queries must be projected with the saved
+             projection.npz (project()).
+
+--report prints recall@k against the full vectors for a sample of leave-one-out
+queries (each a paper's own vector with the paper excluded), plus the brute-force
+search cost per query, for every listed width, so a width can be picked before
+anything is written.
+
+Outputs (in the output store directory):
+  vectors.f32, ids.txt, meta.json   the reduced vectors (vector_store.py), same ids
+  projection.npz                    method, dim, mean, components (pca)
+
+Usage:
+  python reduce_dims.py ai_vectors --report 128,256,512,768,1536
+  python reduce_dims.py ai_vectors ai_vectors_768 --method truncate --dim 768
+  python reduce_dims.py ai_vectors ai_vectors_pca256 --method pca --dim 256
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from vector_search import normalize, recall_at_k, top_k
+from vector_store import VectorStore
+
+METHODS = ("truncate", "pca")
+PROJECTION = "projection.npz"
+BATCH_ROWS = 4096
+
+
+def fit(matrix, method: str, dim: int) -> dict:
+    """The projection for `method` at width `dim`, fitted on the (n, d) corpus matrix."""
+    n, full = matrix.shape
+    if not 0 < dim <= full:
+        raise ValueError(f"dim must be between 1 and {full}")
+    if method == "truncate":
+        return {"method": method, "dim": dim}
+    if method != "pca":
+        raise ValueError(f"unknown method {method!r} (expected one of {', '.join(METHODS)})")
+    if dim > n:
+        raise ValueError(f"pca needs at least as many vectors as dims ({n} < {dim})")
+    m = normalize(matrix)
+    mean = m.mean(axis=0)
+    # rows of vt are the principal axes, strongest first
+    _, _, vt = np.linalg.svd(m - mean, full_matrices=False)
+    return {"method": method, "dim": dim, "mean": mean.astype(np.float32), "components": vt[:dim].astype(np.float32)}
+
+
+def narrowed(projection: dict, dim: int) -> dict:
+    """The same projection cut to `dim` (principal components are nested, like the truncation)."""
+    narrow = dict(projection, dim=dim)
+    if "components" in projection:
+        narrow["components"] = projection["components"][:dim]
+    return narrow
+
+
+def project(vectors, projection: dict):
+    """Reduced, normalized float32 vectors (works for the corpus and for new query embeddings)."""
+    m = normalize(np.atleast_2d(vectors))
+    if projection["method"] == "truncate":
+        return normalize(m[:, :projection["dim"]])
+    return normalize((m - projection["mean"]) @ projection["components"].T)
+
+
+def save_projection(path: str, projection: dict):
+    np.savez(path, **{key: np.asarray(value) for key, value in projection.items()})
+
+
+def load_projection(path: str) -> dict:
+    with np.load(path) as data:
+        projection = {key: data[key] for key in data.files}
+    projection["method"] = str(projection["method"])
+    projection["dim"] = int(projection["dim"])
+    return projection
+
+
+def search_seconds(queries, base, k: int, repeat: int = 3) -> float:
+    """Best-of-repeat brute-force top-k time per query."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        top_k(queries, base, k)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries)
+
+
+def report(matrix, widths, methods, k: int, queries: int, seed: int):
+    n, full = matrix.shape
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(n, size=min(queries, n), replace=False)
+    base = normalize(matrix)
+    exact, _ = top_k(base[query_rows], base, k, exclude=query_rows)
+    full_cost = search_seconds(base[query_rows], base, k)
+    print(f"{n} vectors x {full} dims, {len(query_rows)} queries, k={k}")
+    print(f"{'method':<9} {'dim':>5} {f'recall@{k}':>10} {'top-1':>6} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'full':<9} {full:>5} {1.0:>10.3f} {1.0:>6.3f} {full_cost * 1e3:>9.3f} {1.0:>7.1f}x")
+    for method in methods:
+        usable = [dim for dim in widths if dim <= full and (method != "pca" or dim <= n)]
+        if not usable:
+            continue
+        # one fit at the widest width; narrower ones are its leading components
+        widest = fit(matrix, method, max(usable))
+        for dim in usable:
+            reduced = project(matrix, narrowed(widest, dim))
+            found, _ = top_k(reduced[query_rows], reduced, k, exclude=query_rows)
+            cost = search_seconds(reduced[query_rows], reduced, k)
+            print(f"{method:<9} {dim:>5} {recall_at_k(exact, found):>10.3f} {np.mean(exact[:, 0] == found[:, 0]):>6.3f} "
+                  f"{cost * 1e3:>9.3f} {full_cost / cost:>7.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce the embedding store's dimensionality and measure recall@k.")
+    parser.add_argument("source", help="Vector store with the full vectors")
+    parser.add_argument("output", nargs="?", help="Vector store to write the reduced vectors to")
+    parser.add_argument("--method", choices=METHODS, help="Reduction to write (default truncate) or to report on (default both)")
+    parser.add_argument("--dim", type=int, default=768, help="Width of the reduced vectors")
+    parser.add_argument("--report", help="Comma-separated widths to report recall@k for (both methods unless --method is given)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=300, help="Leave-one-out queries sampled for the report")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    source = VectorStore(args.source)
+    ids, matrix = source.load()
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if args.report:
+        methods = [args.method] if args.method else list(METHODS)
+        report(matrix, [int(w) for w in args.report.split(",")], methods, args.k, args.queries, args.seed)
+    if not args.output:
+        return
+
+    method = args.method or "truncate"
+    projection = fit(matrix, method, args.dim)
+    out = VectorStore(args.output)
+    if len(out):
+        raise SystemExit(f"{args.output} already holds {len(out)} vectors; pick a new directory")
+    for start in range(0, len(ids), BATCH_ROWS):
+        out.append(ids[start:start + BATCH_ROWS], project(matrix[start:start + BATCH_ROWS], projection))
+    save_projection(os.path.join(args.output, PROJECTION), projection)
+    print(f"Wrote {len(out)} vectors of {args.dim} dims ({method}) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,27 +9,83 @@ Reference PMCID extraction rule:
   - If none found, as a last resort search the textual content of the <ref> for 'PMC\d+' and use that.
   - Otherwise skip the reference.
 
+Fetching:
+  - Rows are fetched by a thread pool (MAX_WORKERS in flight). Requests go through the
+    shared pooled client (http_client.py), whose per-host token bucket keeps eutils at
+    NCBI's quota: 3 req/s without a key, 10 req/s with NCBI_API_KEY set. A full rebuild
+    is bounded by the quota, not by serial round-trips.
+  - PMCIDs are sent BATCH_SIZE at a time as one comma-separated efetch id list. The
+    returned <pmc-articleset> is streamed and each <article> is parsed as it arrives.
+    IDs from a batch whose request fails are retried one by one.
+
+Parsing:
+  - Title, authors, journal, year and reference PMCIDs come out of one lxml iterparse
+    pass (pmc_xml.iter_article_metadata) that clears refs/sections as it goes. The
+    BeautifulSoup extractors below give identical output and are only used for XML
+    that lxml's strict parser rejects.
+  - --pipeline splits the work into stages (pipeline.py): I/O threads fetch and split
+    the articlesets, a process pool parses articles on every core, and the main thread
+    alone writes the journal, with bounded queues in between so network and parse time
+    overlap.
+
+Checkpointing:
+  - Every finished record is appended to JOURNAL (NDJSON, see ndjson_io.py) as soon as
+    its batch completes, so a crash or Ctrl-C loses at most the batches in flight.
+  - --resume skips PMCIDs already in the journal and fetches only the rest.
+  - At the end the journal is compacted into OUTPUT (NDJSON, CSV order). It is deleted
+    once every PMCID is in, and kept otherwise so --resume retries only the failures.
+
+Crawling:
+  - --crawl keeps going after the CSV: reference PMCIDs that are not scraped yet go into
+    a deduplicated frontier, and the most-cited of them (counted over everything scraped
+    so far) are fetched first, BATCH_SIZE per request with MAX_WORKERS batches in flight.
+  - Newly scraped papers add their own references, up to --max-depth citation hops from
+    the CSV, until the frontier is empty or --max-papers extra papers have been requested.
+
+Metrics:
+  - Each run writes metrics/scrape.json and metrics/scrape.prom (see metrics.py): papers
+    written, batches and fallbacks, batch and parse time histograms, and per-host HTTP
+    requests, bytes, retries and latency.
+
+Usage:
+  python scraper/newest_scraper.py
+  python scraper/newest_scraper.py --resume
+  python scraper/newest_scraper.py --pipeline
+  python scraper/newest_scraper.py --crawl --max-depth 2 --max-papers 5000
+
 """
 
 import os
 import re
+import sys
+import heapq
+import argparse
+import itertools
 import time
-import json
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
-from tqdm import tqdm
+from lxml import etree
 from dotenv import load_dotenv
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+# shared pipeline helpers live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pmc_xml import iter_article_metadata, parse_article_metadata, split_articleset
+import metrics
+from pipeline import run_pipeline
+from http_cache import cached_get, cached_stream
+from ndjson_io import RecordWriter, iter_records, write_records
 
 load_dotenv()
 NCBI_API_KEY = os.getenv("NCBI_API_KEY")
 
 # Config - edit these as needed
 INPUT_CSV = "SB_publication_PMC.csv"
-OUTPUT_JSON = "pmc_papers.json"
+OUTPUT = "pmc_papers.ndjson"
+JOURNAL = "pmc_papers.journal.ndjson"
 EFETCH = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; PMC-Minimal-Scraper/1.0)"}
-SLEEP_BETWEEN = 0.34   # be polite to NCBI
+MAX_WORKERS = 8        # requests kept in flight; http_client's eutils bucket caps the start rate
+BATCH_SIZE = 150       # PMCIDs per efetch request (1 = one request per paper)
 
 PMCID_RE = re.compile(r"(PMC\d+)", re.I)
 PMC_LINK_RE = re.compile(r"/pmc/articles/(PMC\d+)", re.I)
@@ -41,13 +97,28 @@ def efetch_pmc_xml(pmcid: str):
     if NCBI_API_KEY:
         params["api_key"] = NCBI_API_KEY
     try:
-        r = requests.get(EFETCH, params=params, headers=HEADERS, timeout=30)
+        r = cached_get(EFETCH, params=params, headers=HEADERS, timeout=30)
         r.raise_for_status()
         return r.text
     except Exception:
         return None
 
+def efetch_pmc_articles(pmcids):
+    """
+    Fetch many PMCIDs in one efetch call and yield (pmcid, metadata) per <article>
+    as it streams in. POST keeps long id lists out of the URL. Raises on HTTP or XML errors.
+    Responses go through the shared on-disk cache, so re-runs read the batch from disk.
+    """
+    params = {"db": "pmc", "id": ",".join(pmcids), "retmode": "xml"}
+    if NCBI_API_KEY:
+        params["api_key"] = NCBI_API_KEY
+    with cached_stream("POST", EFETCH, params=params, headers=HEADERS, timeout=120) as body:
+        yield from iter_article_metadata(body)
+
 def parse_metadata_from_xml(xml_text: str):
+    # fallback path only; keep bs4 out of module load
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(xml_text, "lxml-xml")
     # title
     title = None
@@ -123,10 +194,16 @@ def extract_pmcids_from_ref_node(ref_node):
     return found
 
 # ---------- main ----------
-def main():
-    if not os.path.exists(INPUT_CSV):
-        raise FileNotFoundError(f"CSV not found: {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV)
+def read_input_rows(csv_path: str):
+    """
+    Return an ordered {pmcid: csv_title} for every CSV row whose link carries a PMCID.
+    A PMCID listed twice keeps its first position and its last title.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found: {csv_path}")
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
     # detect URL and title columns
     url_col = None
     title_col = None
@@ -138,9 +215,8 @@ def main():
     if url_col is None:
         raise ValueError("Could not detect a URL column in the CSV. Ensure the CSV includes the article link.")
 
-    results = {}
-    rows = list(df.itertuples(index=False))
-    for row in tqdm(rows, desc="rows"):
+    pending = {}
+    for row in df.itertuples(index=False):
         # convert to dict-like
         rowd = row._asdict() if hasattr(row, "_asdict") else dict(zip(df.columns, row))
         url = str(rowd[url_col])
@@ -149,54 +225,301 @@ def main():
         # extract PMCID from the URL (require PMCID presence)
         m = PMCID_RE.search(url)
         if not m:
-            # normalize malformed forms by searching for PMC... anywhere in the URL
-            m2 = re.search(r"(PMC\d+)", url, re.I)
-            if not m2:
-                # skip entries that don't have a PMCID in the link
+            # skip entries that don't have a PMCID in the link
+            continue
+        pending[m.group(1).upper()] = csv_title
+    return pending
+
+def metadata_from_xml(xml: str):
+    """
+    Title, authors, year, journal and reference PMCIDs of one paper's XML.
+    Uses the single-pass lxml extractor; falls back to BeautifulSoup when lxml rejects the XML.
+    """
+    with metrics.timer("parse"):
+        try:
+            meta = parse_article_metadata(xml)
+            if meta is not None:
+                return meta
+        except etree.XMLSyntaxError:
+            pass
+        metrics.count("parse_fallbacks")
+        return _metadata_from_xml_bs4(xml)
+
+def _metadata_from_xml_bs4(xml: str):
+    title, authors, year, journal = parse_metadata_from_xml(xml)
+
+    # parse ref nodes and extract PMCID links
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(xml, "lxml-xml")
+    pmc_refs = []
+    for ref in soup.find_all("ref"):
+        for p in extract_pmcids_from_ref_node(ref):
+            if p not in pmc_refs:
+                pmc_refs.append(p)
+    return {"title": title, "authors": authors, "year": year, "journal": journal, "references": pmc_refs}
+
+def timed_metadata_from_xml(xml: str):
+    """Pipeline parse stage: (metadata, parse seconds), since worker processes cannot record metrics."""
+    start = time.perf_counter()
+    meta = metadata_from_xml(xml)
+    return meta, time.perf_counter() - start
+
+def build_record(meta: dict, csv_title: str = None):
+    """Turn extracted metadata into the output record."""
+    title = meta["title"]
+    if not title and csv_title:
+        title = csv_title
+    # final object only contains the requested fields
+    return {
+        "title": title if title else None,
+        "authors": meta["authors"] if meta["authors"] else [],
+        "year": meta["year"] if meta["year"] else None,
+        "journal": meta["journal"] if meta["journal"] else None,
+        "references": meta["references"],
+        "citations": 0
+    }
+
+def scrape_one(pmcid: str, csv_title: str = None):
+    """Fetch and parse one paper; returns the output record or None if the fetch failed."""
+    # fetch XML from NCBI efetch
+    xml = efetch_pmc_xml(pmcid)
+    if not xml:
+        # skip if we couldn't fetch xml
+        return None
+    return build_record(metadata_from_xml(xml), csv_title)
+
+def scrape_batch(batch: dict):
+    """
+    Fetch and parse {pmcid: csv_title} with a single efetch request.
+    Returns {pmcid: record}; PMCIDs NCBI did not return are simply absent.
+    """
+    records = {}
+    metrics.count("batches")
+    try:
+        with metrics.timer("batch"):
+            for pmcid, meta in efetch_pmc_articles(list(batch)):
+                if pmcid in batch:
+                    records[pmcid] = build_record(meta, batch[pmcid])
+    except Exception:
+        # a failed or truncated batch falls back to per-paper requests for what is left
+        metrics.count("batch_fallbacks")
+        for pmcid, csv_title in batch.items():
+            if pmcid not in records:
+                record = scrape_one(pmcid, csv_title)
+                if record is not None:
+                    records[pmcid] = record
+    return records
+
+def fetch_batch_xml(batch: dict):
+    """
+    Pipeline fetch stage: yield (pmcid, article_xml) for {pmcid: csv_title} without
+    parsing anything. Falls back to per-paper requests if the batch request fails.
+    """
+    sent = set()
+    params = {"db": "pmc", "id": ",".join(batch), "retmode": "xml"}
+    if NCBI_API_KEY:
+        params["api_key"] = NCBI_API_KEY
+    try:
+        with cached_stream("POST", EFETCH, params=params, headers=HEADERS, timeout=120) as body:
+            for pmcid, xml in split_articleset(body):
+                if pmcid in batch and pmcid not in sent:
+                    sent.add(pmcid)
+                    yield pmcid, xml
+    except Exception:
+        for pmcid in batch:
+            if pmcid not in sent:
+                xml = efetch_pmc_xml(pmcid)
+                if xml:
+                    yield pmcid, xml
+
+# ---------- checkpoint journal ----------
+def load_journal(path: str):
+    """{pmcid: record} from a journal; a line torn by a crash mid-write is ignored."""
+    if not os.path.exists(path):
+        return {}
+    return dict(iter_records(path, tolerate_torn_tail=True))
+
+def open_journal(path: str, resume: bool):
+    """Open the journal for appending, one flushed line per record (fresh unless resuming)."""
+    if not resume and os.path.exists(path):
+        os.remove(path)
+    return RecordWriter(path, append=True)
+
+# ---------- citation crawl ----------
+class CrawlFrontier:
+    """
+    Unseen PMCIDs waiting to be crawled, most-cited first. Each PMCID enters at most
+    once; its citation count keeps growing while it waits and its depth is the fewest
+    citation hops from a seed paper.
+    """
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self.cites = Counter()
+        self.depth = {}
+        self.seen = set()  # scraped or already handed out
+        self._heap = []
+        self._seq = itertools.count()
+
+    def mark_seen(self, pmcid: str):
+        self.seen.add(pmcid)
+
+    def cite(self, pmcid: str, depth: int):
+        """Record one citation of pmcid from a paper at depth - 1."""
+        if pmcid in self.seen or depth > self.max_depth:
+            return
+        self.cites[pmcid] += 1
+        self.depth[pmcid] = min(depth, self.depth.get(pmcid, depth))
+        # stale heap entries (older, lower counts) are skipped in pop_batch
+        heapq.heappush(self._heap, (-self.cites[pmcid], self.depth[pmcid], next(self._seq), pmcid))
+
+    def pop_batch(self, n: int):
+        batch = []
+        while self._heap and len(batch) < n:
+            neg_cites, _, _, pmcid = heapq.heappop(self._heap)
+            if pmcid in self.seen or -neg_cites != self.cites[pmcid]:
                 continue
-            pmcid = m2.group(1).upper()
+            self.seen.add(pmcid)
+            batch.append(pmcid)
+        return batch
+
+    def __len__(self):
+        return sum(1 for p in self.cites if p not in self.seen)
+
+def seed_depths(seeds, done: dict):
+    """Citation-hop depth of every scraped paper reachable from the seeds (BFS)."""
+    depth = {p: 0 for p in seeds if p in done}
+    queue = deque(depth)
+    while queue:
+        pmcid = queue.popleft()
+        for ref in done[pmcid]["references"]:
+            if ref in done and ref not in depth:
+                depth[ref] = depth[pmcid] + 1
+                queue.append(ref)
+    return depth
+
+def crawl(seeds, done: dict, journal, max_depth: int, max_papers: int):
+    """
+    Expand `done` along reference edges, appending every new record to the journal.
+    Returns the crawled PMCIDs in the order they were scraped.
+    """
+    from tqdm import tqdm
+
+    frontier = CrawlFrontier(max_depth)
+    depth = seed_depths(seeds, done)
+    for pmcid in done:
+        frontier.mark_seen(pmcid)
+    for pmcid, d in depth.items():
+        for ref in done[pmcid]["references"]:
+            frontier.cite(ref, d + 1)
+
+    crawled = []
+    budget = max_papers
+    size = max(1, BATCH_SIZE)
+    pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    in_flight = {}
+    try:
+        with tqdm(total=max_papers, desc="crawl") as pbar:
+            while True:
+                # keep MAX_WORKERS batches in flight while the frontier and the budget allow
+                while len(in_flight) < MAX_WORKERS and budget > 0:
+                    ids = frontier.pop_batch(min(size, budget))
+                    if not ids:
+                        break
+                    budget -= len(ids)
+                    in_flight[pool.submit(scrape_batch, dict.fromkeys(ids))] = ids
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    ids = in_flight.pop(fut)
+                    records = fut.result()
+                    for pmcid in ids:
+                        record = records.get(pmcid)
+                        if record is None:
+                            continue
+                        journal.write(pmcid, record)
+                        done[pmcid] = record
+                        crawled.append(pmcid)
+                        metrics.count("items")
+                        metrics.count("crawled_papers")
+                        for ref in record["references"]:
+                            frontier.cite(ref, frontier.depth[pmcid] + 1)
+                    pbar.update(len(ids))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    print(f"Crawled {len(crawled)} papers beyond the CSV; {len(frontier)} still in the frontier")
+    return crawled
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape PMC metadata and reference PMCIDs for every paper in the CSV.")
+    parser.add_argument("--resume", action="store_true", help=f"Skip PMCIDs already recorded in {JOURNAL} by an interrupted run")
+    parser.add_argument("--pipeline", action="store_true", help="Parse in a process pool while I/O threads keep fetching")
+    parser.add_argument("--crawl", action="store_true", help="After the CSV, follow reference PMCIDs to papers outside it")
+    parser.add_argument("--max-depth", type=int, default=1, help="Citation hops from the CSV papers to crawl (with --crawl)")
+    parser.add_argument("--max-papers", type=int, default=1000, help="Extra papers to request at most (with --crawl)")
+    args = parser.parse_args(argv)
+    scrape(args)
+
+@metrics.stage("scrape")
+def scrape(args):
+    pending = read_input_rows(INPUT_CSV)
+    done = load_journal(JOURNAL) if args.resume else {}
+    ids = [pmcid for pmcid in pending if pmcid not in done]
+    if args.resume:
+        print(f"Resuming: {len(pending) - len(ids)} already in {JOURNAL}, {len(ids)} to fetch")
+
+    size = max(1, BATCH_SIZE)
+    batches = [{pmcid: pending[pmcid] for pmcid in ids[i:i + size]} for i in range(0, len(ids), size)]
+
+    from tqdm import tqdm
+
+    with open_journal(JOURNAL, args.resume) as journal, tqdm(total=len(ids), desc="rows") as pbar:
+        if args.pipeline:
+            def save(pmcid, parsed):
+                meta, parse_seconds = parsed
+                metrics.observe("parse", parse_seconds)
+                record = build_record(meta, pending[pmcid])
+                journal.write(pmcid, record)
+                done[pmcid] = record
+                metrics.count("items")
+                pbar.update(1)
+
+            run_pipeline(batches, fetch=fetch_batch_xml, parse=timed_metadata_from_xml, write=save, io_workers=MAX_WORKERS)
         else:
-            pmcid = m.group(1).upper()
+            pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+            try:
+                futures = {pool.submit(scrape_batch, batch): len(batch) for batch in batches}
+                for fut in as_completed(futures):
+                    for pmcid, record in fut.result().items():
+                        journal.write(pmcid, record)
+                        done[pmcid] = record
+                        metrics.count("items")
+                    pbar.update(futures[fut])
+            finally:
+                # on Ctrl-C do not wait for queued batches; the journal already has the finished ones
+                pool.shutdown(wait=False, cancel_futures=True)
 
-        # fetch XML from NCBI efetch
-        xml = efetch_pmc_xml(pmcid)
-        if not xml:
-            # skip if we couldn't fetch xml
-            time.sleep(SLEEP_BETWEEN)
-            continue
+    if args.crawl:
+        with open_journal(JOURNAL, resume=True) as journal:
+            crawl(pending, done, journal, args.max_depth, args.max_papers)
+
+    # compact the journal; keep CSV order in the output regardless of completion order,
+    # with crawled papers after the CSV ones
+    results = {pmcid: done[pmcid] for pmcid in pending if pmcid in done}
+    for pmcid, record in done.items():
+        results.setdefault(pmcid, record)
 
-        # parse metadata
-        title, authors, year, journal = parse_metadata_from_xml(xml)
-        if not title and csv_title:
-            title = csv_title
-
-        # parse ref nodes and extract PMCID links
-        soup = BeautifulSoup(xml, "lxml-xml")
-        ref_nodes = soup.find_all("ref")
-        pmc_refs = []
-        for ref in ref_nodes:
-            pmcs_in_ref = extract_pmcids_from_ref_node(ref)
-            for p in pmcs_in_ref:
-                if p not in pmc_refs:
-                    pmc_refs.append(p)
-        # final object only contains the requested fields
-        results[pmcid] = {
-            "title": title if title else None,
-            "authors": authors if authors else [],
-            "year": year if year else None,
-            "journal": journal if journal else None,
-            "references": pmc_refs
-            "citations": 0
-        }
-        # polite pause
-        time.sleep(SLEEP_BETWEEN)
-
-    # write minimal JSON
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-
-    print(f"Wrote {len(results)} items to {OUTPUT_JSON}")
+    # write minimal records, one per line
+    write_records(OUTPUT, results.items())
+
+    print(f"Wrote {len(results)} items to {OUTPUT}")
+    metrics.count("failed_papers", sum(p not in done for p in pending))
+    if all(pmcid in done for pmcid in pending):
+        os.remove(JOURNAL)
+    else:
+        print(f"{sum(p not in done for p in pending)} papers failed; rerun with --resume to retry only those")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,68 @@
+"""
+vector_search.py (exact cosine top-k over embedding matrices, and recall@k)
+
+The reference every approximate or reduced search is measured against: vectors are
+L2-normalized once so cosine similarity is a dot product, and top-k is taken with
+argpartition (O(n) per query) before sorting just the k winners.
+
+all_top_k() does this for every row of the corpus against every other row (the
+"similar papers" lists build_data.py writes into the dataset), one block of rows per
+matrix multiply, so memory stays at about BLOCK_ELEMENTS similarities however large
+the corpus gets.
+
+Usage:
+  base = normalize(matrix)
+  rows, sims = top_k(normalize(queries), base, k=10, exclude=query_rows)
+  recall_at_k(rows, approx_rows)
+  for start, rows, sims in all_top_k(base, k=10): ...
+"""
+
+import numpy as np
+
+BLOCK_ELEMENTS = 1 << 24   # similarities per block (64 MB of float32)
+
+
+def normalize(matrix):
+    """float32 copy of matrix with unit-length rows (zero rows stay zero)."""
+    m = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def top_k(queries, base, k: int, exclude=None):
+    """
+    (rows, sims): the k most similar base rows for every query, best first. Both inputs
+    must already be normalized. exclude[i] is a base row query i may not match (its
+    own paper in leave-one-out evaluation).
+    """
+    sims = queries @ base.T
+    if exclude is not None:
+        sims[np.arange(len(queries)), exclude] = -np.inf
+    k = min(k, base.shape[0])
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    part_sims = np.take_along_axis(sims, part, axis=1)
+    order = np.argsort(-part_sims, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_sims, order, axis=1)
+
+
+def recall_at_k(exact_rows, found_rows) -> float:
+    """Mean share of each query's exact top-k that the approximate top-k also found."""
+    k = exact_rows.shape[1]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(exact_rows.tolist(), found_rows.tolist())]))
+
+
+def all_top_k(base, k: int, block_rows: int = None):
+    """
+    Yield (start, rows, sims) for consecutive blocks of the normalized corpus: the k
+    nearest other rows of rows start, start + 1, ..., best first.
+    """
+    n = base.shape[0]
+    k = min(k, n - 1)
+    if k < 1:
+        return
+    block_rows = block_rows or max(1, BLOCK_ELEMENTS // n)
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        rows, sims = top_k(base[start:stop], base, k, exclude=np.arange(start, stop))
+        yield start, rows, sims
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+vector_store.py (append-only float32 embedding store)
+
+The embeddings used to travel as JSON number lists inside every summary record,
+about 40 KB of decimal text per 3072-dim vector, and they had to be parsed back
+before any math could be done on them. A store is a directory holding:
+
+  vectors.f32   row-major little-endian float32 matrix, one row per append
+  ids.txt       the id of each row, one per line (line i <-> row i)
+  meta.json     {"dim": ..., "dtype": "float32", "rows": ...}
+
+  - append() writes a batch as one block of bytes and one block of id lines: O(batch),
+    whatever the size of the store
+  - load() memory-maps the matrix (np.memmap), so readers get an (n, dim) array with
+    no parsing and pages are only read when touched
+  - an id appended again (a re-run) takes the later row; index() maps id -> row
+  - rows are written before their ids and a crash can tear either file, so opening a
+    store trims both back to the last complete row
+
+Summaries stay in the NDJSON records (get_sums_and_vecs.py); newMerge.py joins the
+vectors back in for the client's JSON dataset.
+
+For the client export, vectors can be cut down (export_vector, build_data.py
+--vector-format):
+  float16   values rounded to half precision (2 bytes/dim)
+  int8      symmetric per-vector scale: vector ~= q * scale, q in [-127, 127]
+            (1 byte/dim + one float). Cosine similarity ignores a vector's scale, so
+            findClosestEmbedding can rank the int8 values as they are; vector_scale is
+            only needed to recover magnitudes.
+benchmarks/bench_quantization.py measures the nearest-neighbour recall each costs.
+
+Usage:
+  store = VectorStore("ai_vectors")
+  store.append(["PMC1", "PMC2"], [[...], [...]])
+  ids, matrix = store.load()
+  matrix[store.index()["PMC2"]]
+
+  python vector_store.py info ai_vectors
+  python vector_store.py import fixed_summary_vector.ndjson ai_vectors --summaries ai_json.ndjson
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import threading
+
+VECTORS = "vectors.f32"
+IDS = "ids.txt"
+META = "meta.json"
+DTYPE = "<f4"
+ITEMSIZE = 4
+
+
+class VectorStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.dim = None
+        self._rows = 0
+        self._lock = threading.Lock()
+        meta_path = os.path.join(root, META)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+            self._repair()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _repair(self):
+        """Trim a torn tail so vectors.f32 and ids.txt describe the same rows."""
+        ids_path, vec_path = self._path(IDS), self._path(VECTORS)
+        if not os.path.exists(vec_path):
+            open(vec_path, "wb").close()
+        if not os.path.exists(ids_path):
+            open(ids_path, "wb").close()
+        row_bytes = self.dim * ITEMSIZE
+        with open(ids_path, "rb") as f:
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        rows = min(complete.count(b"\n"), os.path.getsize(vec_path) // row_bytes)
+        if rows != complete.count(b"\n") or len(complete) != len(data):
+            keep = b"".join(line + b"\n" for line in complete.split(b"\n")[:rows])
+            with open(ids_path, "wb") as f:
+                f.write(keep)
+        if os.path.getsize(vec_path) != rows * row_bytes:
+            with open(vec_path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+        self._rows = rows
+
+    def _write_meta(self):
+        tmp = self._path(META + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": "float32", "rows": self._rows}, f)
+        os.replace(tmp, self._path(META))
+
+    def __len__(self):
+        return self._rows
+
+    # ---------- writing ----------
+    def append(self, ids, vectors):
+        """Append one row per id. All vectors must have the store's dimension."""
+        import numpy as np
+
+        ids = [str(i) for i in ids]
+        matrix = np.asarray(vectors, dtype=DTYPE)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError(f"expected {len(ids)} vectors, got an array of shape {matrix.shape}")
+        if any("\n" in i for i in ids):
+            raise ValueError("ids cannot contain newlines")
+        with self._lock:
+            if self.dim is None:
+                os.makedirs(self.root, exist_ok=True)
+                self.dim = int(matrix.shape[1])
+                self._repair()
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"vector dimension {matrix.shape[1]} does not match the store's {self.dim}")
+            with open(self._path(VECTORS), "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._path(IDS), "a", encoding="utf-8") as f:
+                f.write("".join(i + "\n" for i in ids))
+            self._rows += len(ids)
+            self._write_meta()
+
+    # ---------- reading ----------
+    def ids(self):
+        if not self._rows:
+            return []
+        with open(self._path(IDS), encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f][:self._rows]
+
+    def matrix(self, mmap: bool = True):
+        """(rows, dim) float32 array; memory-mapped (read-only) unless mmap=False."""
+        import numpy as np
+
+        if not self._rows:
+            return np.zeros((0, self.dim or 0), dtype=DTYPE)
+        if mmap:
+            return np.memmap(self._path(VECTORS), dtype=DTYPE, mode="r", shape=(self._rows, self.dim))
+        return np.fromfile(self._path(VECTORS), dtype=DTYPE, count=self._rows * self.dim).reshape(self._rows, self.dim)
+
+    def load(self, mmap: bool = True):
+        """(ids, matrix) with row i of the matrix belonging to ids[i]."""
+        return self.ids(), self.matrix(mmap)
+
+    def index(self) -> dict:
+        """id -> row; an id appended more than once maps to its last row."""
+        return {record_id: row for row, record_id in enumerate(self.ids())}
+
+    def get(self, record_id, default=None):
+        row = self.index().get(record_id)
+        return default if row is None else self.matrix()[row]
+
+
+def vector_to_json(row):
+    """A float32 (or float16) row as a JSON-friendly list, each value at its shortest round-trip form."""
+    return [float(str(x)) for x in row]
+
+
+# ---------- quantization ----------
+VECTOR_FORMATS = ("float32", "float16", "int8")
+INT8_MAX = 127
+
+
+def quantize_int8(matrix):
+    """Symmetric per-row int8 quantization. Returns (q, scales) with row ~= q * scale."""
+    import numpy as np
+
+    m = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    scales = np.abs(m).max(axis=1) / INT8_MAX
+    scales[scales == 0] = 1.0
+    q = np.clip(np.rint(m / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def dequantize_int8(q, scales):
+    import numpy as np
+
+    return np.asarray(q, dtype=np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def quantize(matrix, vector_format: str):
+    """The float32 matrix as it reads back after export in vector_format (for measuring the loss)."""
+    import numpy as np
+
+    if vector_format == "float16":
+        return np.asarray(matrix, dtype=np.float16).astype(np.float32)
+    if vector_format == "int8":
+        return dequantize_int8(*quantize_int8(matrix))
+    return np.asarray(matrix, dtype=np.float32)
+
+
+def export_vector(vector, vector_format: str = "float32") -> dict:
+    """Record fields for one vector in the client export: {"vector": ...} (+ "vector_scale" for int8)."""
+    import numpy as np
+
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError(f"unknown vector format {vector_format!r} (expected one of {', '.join(VECTOR_FORMATS)})")
+    if vector_format == "float16":
+        return {"vector": vector_to_json(np.asarray(vector, dtype=np.float16))}
+    if vector_format == "int8":
+        q, scales = quantize_int8(vector)
+        return {"vector": q[0].tolist(), "vector_scale": float(str(scales[0]))}
+    return {"vector": vector_to_json(np.asarray(vector, dtype=np.float32))}
+
+
+# ---------- cli ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a vector store or build one from NDJSON records.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="Rows, dimension and size of a store")
+    info.add_argument("store")
+    imp = sub.add_parser("import", help="Move the 'vector' fields of NDJSON (or legacy .json) records into a store")
+    imp.add_argument("records", help="Records with a 'vector' field (e.g. fixed_summary_vector.ndjson)")
+    imp.add_argument("store", help="Store directory to append to")
+    imp.add_argument("--summaries", help="Also write the records without their vectors here (NDJSON)")
+    imp.add_argument("--batch", type=int, default=1000, help="Rows per append")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        store = VectorStore(args.store)
+        size = os.path.getsize(store._path(VECTORS)) if len(store) else 0
+        print(f"{len(store)} rows ({len(store.index())} ids), dim {store.dim}, {size / 1e6:.1f} MB")
+        return
+
+    from ndjson_io import RecordWriter, iter_records
+
+    store = VectorStore(args.store)
+    ids, vectors = [], []
+    with RecordWriter(args.summaries) if args.summaries else contextlib.nullcontext() as out:
+        for record_id, record in iter_records(args.records):
+            vector = record.pop("vector", None)
+            if out is not None:
+                out.write(record_id, record)
+            if vector is not None:
+                ids.append(record_id)
+                vectors.append(vector)
+            if len(ids) >= args.batch:
+                store.append(ids, vectors)
+                ids, vectors = [], []
+        if ids:
+            store.append(ids, vectors)
+    print(f"{args.store}: {len(store)} rows, dim {store.dim}")
+
+
+if __name__ == "__main__":
+    main()